@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script compares the granularity of the memory read phases (see AmaltheaParser), i.e. a single
+read phase per task against read phases per runnable or per group of labels. For every granularity,
+it measures the time of creating the memory tasks and of the analysis and reports the WCRT of every
+task and its deviation from the first granularity (the reference). If no model is given,
+a synthetic model is generated (see waters.generator).
+"""
+
+from __future__ import print_function
+
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import generator
+from waters import log
+from pycpa import options
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+log.add_options(options.parser)
+options.parser.add_argument('--model', type=str, default=None,
+        help="Almathea model (default: a generated model).")
+options.parser.add_argument('--read_phases', type=str, default='task,runnable',
+        help="Comma-separated list of read phase granularities (task, runnable or number of labels per phase), "
+             "the first one serves as reference.")
+options.parser.add_argument('--let_mode', action='store_true',
+        help="Use LET communication.")
+options.parser.add_argument('--scale', type=float, default=0.7,
+        help="Scales execution times (?) in the given model (to render the system schedulable).")
+options.parser.add_argument('--let_task_wcet', type=int, default=50,
+        help="Constant execution time for LET Tasks")
+options.parser.add_argument('--tasks', type=int, default=20,
+        help="Number of tasks of a generated model.")
+options.parser.add_argument('--labels', type=int, default=1000,
+        help="Number of labels of a generated model.")
+options.parser.add_argument('--repeat', type=int, default=1,
+        help="Number of repetitions (the minimum time is reported).")
+options.parser.add_argument('--output', type=str, default=None,
+        help="Writes the comparison as JSON to given file.")
+
+def run(filename, read_phases):
+    """ Parses and analyses the given model and returns the times and the WCRT of every task. """
+    times = dict()
+
+    amt_parser = atp.AmaltheaParser(filename, scale=options.get_opt('scale'),
+            letMode=options.get_opt('let_mode'), letTaskWCET=options.get_opt('let_task_wcet'),
+            readPhases=atp.read_phases_arg(read_phases))
+    amt_parser.add_resources()
+    amt_parser.add_labels()
+    amt_parser.add_tasks()
+    amt_parser.add_runnables()
+    amt_parser.bind_runnables_to_tasks()
+    amt_parser.bind_labels_to_runables_and_tasks()
+    amt_parser.bind_tasks_to_cores()
+    if len(amt_parser.ecus) > 1:
+        amt_parser.bind_labels_to_memories()
+
+    start = time.time()
+    amt_parser.create_memory_tasks()
+    if options.get_opt('let_mode'):
+        amt_parser.create_LET_tasks()
+    times['memory_tasks'] = time.time() - start
+
+    start = time.time()
+    task_results = waters_analysis.analyze_system(amt_parser.cpa_sys)
+    times['analysis'] = time.time() - start
+
+    wcrt = dict((name, task_results[t].wcrt) for name, t in amt_parser.cpa_tasks.items()
+            if t.resource is not None)
+    phases = sum(len(t.memory_input_tasks) for t in amt_parser.cpa_tasks.values())
+    return {'times' : times, 'wcrt' : wcrt, 'phases' : phases}
+
+def compare(filename, granularities):
+    results = dict()
+    for read_phases in granularities:
+        best = None
+        for i in range(options.get_opt('repeat')):
+            r = run(filename, read_phases)
+            if best is not None:
+                for key, value in best['times'].items():
+                    r['times'][key] = min(r['times'][key], value)
+            best = r
+        results[read_phases] = best
+
+    reference = results[granularities[0]]
+    print("Read phases;Phases;Memory tasks [s];Analysis [s];Improved;Worse;Max. reduction")
+    for read_phases in granularities:
+        r = results[read_phases]
+        deltas = [reference['wcrt'][name] - wcrt for name, wcrt in r['wcrt'].items()]
+        print("%s;%d;%.4f;%.4f;%d;%d;%d" % (read_phases, r['phases'], r['times']['memory_tasks'],
+            r['times']['analysis'], len([d for d in deltas if d > 0]), len([d for d in deltas if d < 0]),
+            max(deltas) if deltas else 0))
+
+    print()
+    print("Task;" + ";".join(granularities))
+    for name in sorted(reference['wcrt']):
+        print("%s;%s" % (name, ";".join(str(results[g]['wcrt'][name]) for g in granularities)))
+
+    return results
+
+if __name__ == "__main__":
+    # initialize pyCPA's default command line arguments
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    granularities = options.get_opt('read_phases').split(',')
+
+    directory = None
+    filename = options.get_opt('model')
+    if filename is None:
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'model.xml')
+        generator.generate_model(filename, tasks=options.get_opt('tasks'), labels=options.get_opt('labels'))
+
+    try:
+        results = compare(filename, granularities)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+    if options.get_opt('output') is not None:
+        with open(options.get_opt('output'), 'w') as outfile:
+            json.dump(results, outfile, indent=1, sort_keys=True)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script benchmarks the parser and the analysis on synthetic models of increasing size
+(see waters.generator). For each model size, it measures the wall time (and optionally the peak
+memory) of every phase and writes the results as JSON. Given the JSON results of a previous run,
+it reports the phases that regressed.
+"""
+
+from __future__ import print_function
+
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import generator
+from waters import log
+from pycpa import options
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import contextlib
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+log.add_options(options.parser)
+options.parser.add_argument('--scales', type=str, default='1,2,4',
+        help="Comma-separated list of scaling factors applied to the number of tasks, labels and chains.")
+options.parser.add_argument('--cores', type=int, default=4,
+        help="Number of cores.")
+options.parser.add_argument('--tasks', type=int, default=20,
+        help="Number of tasks (at scale 1).")
+options.parser.add_argument('--runnables_per_task', type=int, default=10,
+        help="Number of runnables per task.")
+options.parser.add_argument('--labels', type=int, default=1000,
+        help="Number of labels (at scale 1).")
+options.parser.add_argument('--access_density', type=int, default=5,
+        help="Number of label accesses per runnable.")
+options.parser.add_argument('--chains', type=int, default=10,
+        help="Number of cause-effect chains (at scale 1).")
+options.parser.add_argument('--repeat', type=int, default=1,
+        help="Number of repetitions (the minimum time is reported).")
+options.parser.add_argument('--memory', action='store_true',
+        help="Additionally measure the peak memory of every phase (in a separate run).")
+options.parser.add_argument('--output', type=str, default='bench_scaling.json',
+        help="Writes the benchmark results as JSON to given file.")
+options.parser.add_argument('--baseline', type=str, default=None,
+        help="JSON results of a previous run to compare against.")
+options.parser.add_argument('--threshold', type=float, default=0.2,
+        help="Relative slowdown of a phase that is reported as regression.")
+options.parser.add_argument('--min_delta', type=float, default=0.01,
+        help="Absolute slowdown (in seconds) below which a phase is never reported as regression.")
+
+@contextlib.contextmanager
+def phase(results, name, trace_memory):
+    if trace_memory:
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    yield
+    results[name] = {'time' : time.time() - start}
+    if trace_memory:
+        results[name]['peak_memory'] = tracemalloc.get_traced_memory()[1] - start_memory
+
+def run_phases(filename, trace_memory=False):
+    """ Parses and analyses the given model with implicit and LET communication and returns
+        the measurements of every phase.
+    """
+    phases = dict()
+
+    with phase(phases, 'parse', trace_memory):
+        amt_parser = atp.AmaltheaParser(filename, scale=0.7)
+
+    with phase(phases, 'bind', trace_memory):
+        amt_parser.add_resources()
+        amt_parser.add_labels()
+        amt_parser.add_tasks()
+        amt_parser.add_runnables()
+        amt_parser.bind_runnables_to_tasks()
+        amt_parser.bind_labels_to_runables_and_tasks()
+        amt_parser.bind_tasks_to_cores()
+        if len(amt_parser.ecus) > 1:
+            amt_parser.bind_labels_to_memories()
+
+    with phase(phases, 'memory_tasks', trace_memory):
+        amt_parser.create_memory_tasks()
+
+    with phase(phases, 'chains', trace_memory):
+        amt_parser.parse_effect_chains()
+
+    with phase(phases, 'let_tasks', trace_memory):
+        variant = amt_parser.create_LET_variant()
+
+    modes = [('implicit', amt_parser.cpa_sys, amt_parser.eventChains),
+             ('let', variant.system, variant.effect_chains(amt_parser.eventChains))]
+    for mode, s, chains in modes:
+        with phase(phases, mode + ':analysis', trace_memory):
+            task_results = waters_analysis.analyze_system(s)
+
+        with phase(phases, mode + ':chain_latency', trace_memory):
+            waters_analysis.chain_latencies(chains, task_results)
+
+    return phases
+
+def run_config(name, config, directory):
+    filename = os.path.join(directory, name + '.xml')
+    generator.generate_model(filename, **config)
+
+    best = None
+    for i in range(options.get_opt('repeat')):
+        phases = run_phases(filename)
+        if best is None:
+            best = phases
+        else:
+            for key, value in phases.items():
+                best[key]['time'] = min(best[key]['time'], value['time'])
+
+    if options.get_opt('memory') and tracemalloc is not None:
+        tracemalloc.start()
+        for key, value in run_phases(filename, trace_memory=True).items():
+            best[key]['peak_memory'] = value['peak_memory']
+        tracemalloc.stop()
+
+    return {'name' : name, 'config' : config, 'model_size' : os.path.getsize(filename), 'phases' : best}
+
+def compare(results, baseline):
+    """ Prints the time ratio of every phase w.r.t. the baseline and returns the regressions. """
+    regressions = list()
+    old_results = dict((r['name'], r) for r in baseline['results'])
+    for r in results['results']:
+        if r['name'] not in old_results:
+            continue
+        old = old_results[r['name']]
+        if old['config'] != r['config']:
+            print("%s: configuration differs from baseline, skipped" % r['name'])
+            continue
+
+        for key in sorted(r['phases']):
+            if key not in old['phases']:
+                continue
+            t_new = r['phases'][key]['time']
+            t_old = old['phases'][key]['time']
+            ratio = t_new / t_old if t_old > 0 else float('inf')
+            regression = t_new - t_old > options.get_opt('min_delta') and ratio > 1 + options.get_opt('threshold')
+            print("%s;%s;%.4f;%.4f;%.2f%s" % (r['name'], key, t_old, t_new, ratio, ';REGRESSION' if regression else ''))
+            if regression:
+                regressions.append((r['name'], key, t_old, t_new))
+
+    return regressions
+
+if __name__ == "__main__":
+    # initialize pyCPA's default command line arguments
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    results = {'meta' : {'python' : platform.python_version(), 'platform' : platform.platform(),
+                         'date' : time.strftime('%Y-%m-%d %H:%M:%S')},
+               'results' : list()}
+
+    directory = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        for scale in [int(x) for x in options.get_opt('scales').split(',')]:
+            config = {'cores'              : options.get_opt('cores'),
+                      'tasks'              : options.get_opt('tasks') * scale,
+                      'runnables_per_task' : options.get_opt('runnables_per_task'),
+                      'labels'             : options.get_opt('labels') * scale,
+                      'access_density'     : options.get_opt('access_density'),
+                      'chains'             : options.get_opt('chains') * scale}
+            name = 'x%d' % scale
+
+            # suppress the console output of the parser
+            with open(os.devnull, 'w') as devnull:
+                sys.stdout = devnull
+                try:
+                    r = run_config(name, config, directory)
+                finally:
+                    sys.stdout = stdout
+
+            results['results'].append(r)
+            print("%s: %s" % (name, ", ".join("%s=%.3fs" % (key, value['time'])
+                for key, value in sorted(r['phases'].items()))))
+    finally:
+        shutil.rmtree(directory)
+
+    with open(options.get_opt('output'), 'w') as outfile:
+        json.dump(results, outfile, indent=1, sort_keys=True)
+
+    if options.get_opt('baseline') is not None:
+        with open(options.get_opt('baseline')) as infile:
+            baseline = json.load(infile)
+        print("Name;Phase;Baseline;Time;Ratio")
+        regressions = compare(results, baseline)
+        if regressions:
+            print("%d phases regressed" % len(regressions))
+            sys.exit(1)
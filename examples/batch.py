@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script analyses a batch of Almathea models (given as a directory or a manifest file)
+in a pool of worker processes and writes the consolidated results as JSON.
+"""
+
+from waters import AmaltheaParser as atp
+from waters import batch
+from waters import log
+from pycpa import options
+
+import json
+import argparse
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("%s is not a positive integer" % value)
+    return number
+
+options.parser.add_argument('--models', type=str, required=True,
+        help="Directory containing Almathea models or manifest file listing one model per line.")
+log.add_options(options.parser)
+options.parser.add_argument('--output', type=str, default='results_batch.json',
+        help="Writes the consolidated results as JSON to given file.")
+options.parser.add_argument('--workers', type=positive_int, default=None,
+        help="Number of worker processes (default: number of CPUs).")
+options.parser.add_argument('--timeout', type=float, default=None,
+        help="Per-model analysis timeout in seconds.")
+options.parser.add_argument('--cache_dir', type=str, default=None,
+        help="Directory of the persistent result cache (models with stored results are not analysed again).")
+options.parser.add_argument('--cache_size', type=int, default=256,
+        help="Maximum size of the result cache in MB.")
+options.parser.add_argument('--let_mode', action='store_true',
+        help="Use LET communication.")
+options.parser.add_argument('--scale', type=float, default=0.7,
+        help="Scales execution times (?) in the given model (to render the system schedulable).")
+options.parser.add_argument('--let_task_wcet', type=int, default=50,
+        help="Constant execution time for LET Tasks")
+options.parser.add_argument('--read_phases', type=str, default='task',
+        help="Memory read phases of a task: task (a single phase), runnable (one phase per runnable) "
+             "or the number of labels per phase.")
+
+if __name__ == "__main__":
+    # initialize pyCPA's default command line arguments
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    models = batch.find_models(options.get_opt('models'))
+    print("Analysing %d models" % len(models))
+
+    results = batch.run_batch(models,
+            workers=options.get_opt('workers'),
+            timeout=options.get_opt('timeout'),
+            scale=options.get_opt('scale'),
+            let_mode=options.get_opt('let_mode'),
+            let_task_wcet=options.get_opt('let_task_wcet'),
+            cache_dir=options.get_opt('cache_dir'),
+            cache_size=options.get_opt('cache_size') * 1024 * 1024,
+            read_phases=atp.read_phases_arg(options.get_opt('read_phases')))
+
+    with open(options.get_opt('output'), 'w') as outfile:
+        json.dump(results, outfile, indent=1, sort_keys=True)
+
+    failed = [m for m, r in results.items() if r['status'] != 'ok']
+    print("....finished (%d ok, %d failed)" % (len(results) - len(failed), len(failed)))
+    for m in sorted(failed):
+        print("%s: %s" % (m, results[m]['status']))
@@ -17,15 +17,23 @@ This script parses and analyses the WATERS Challenge Model (given as an Almathea
 
 from waters import AmaltheaParser as atp
 from waters import model as waters_model
-from waters import path_analysis
-from pycpa import graph
-from pycpa import analysis
+from waters import analysis as waters_analysis
+from waters import instrumentation
+from waters import log
+from waters import artifacts
+from waters import anytime
+from waters import results
 from pycpa import options
 
-import csv
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 options.parser.add_argument('--model', type=str, required=True,
         help="Almathea model.")
+log.add_options(options.parser)
 options.parser.add_argument('--print_results', action='store_true',
         help="Print results to terminal.")
 options.parser.add_argument('--let_mode', action='store_true',
@@ -42,73 +50,91 @@ options.parser.add_argument('--lat_output', type=str, default=None,
         help="Writes latency results as CSV to given file.")
 options.parser.add_argument('--let_task_wcet', type=int, default=50,
         help="Constant execution time for LET Tasks")
+options.parser.add_argument('--read_phases', type=str, default='task',
+        help="Memory read phases of a task: task (a single phase), runnable (one phase per runnable) "
+             "or the number of labels per phase.")
+options.parser.add_argument('--jsonl_output', type=str, default=None,
+        help="Writes all results (WCRT, loads, memory overhead and latencies) as JSON lines to given file.")
+options.parser.add_argument('--binary_output', type=str, default=None,
+        help="Writes all results in a binary columnar format to given file (see waters.results).")
+options.parser.add_argument('--modes', type=str, default=None,
+        help="Comma-separated list of communication modes to analyse (implicit,let) based on a single parse. "
+             "Output files of the LET mode get the suffix '-let' if both modes are analysed.")
+options.parser.add_argument('--parallel', action='store_true',
+        help="Analyse multiple modes in parallel (forked) processes.")
+options.parser.add_argument('--cmp_output', type=str, default=None,
+        help="Writes the comparison of WCRTs and latencies between the modes as CSV to given file.")
+options.parser.add_argument('--task_dot', type=str, default=None,
+        help="Writes the data streams between the tasks as DOT graph to given file.")
+options.parser.add_argument('--core_dot', type=str, default=None,
+        help="Writes the data streams between the cores as DOT graph to given file.")
+options.parser.add_argument('--graph_output', type=str, default=None,
+        help="Plots the system graph to given file (requires matplotlib).")
+options.parser.add_argument('--sync_artifacts', action='store_true',
+        help="Generate the output files synchronously instead of in a background thread.")
+options.parser.add_argument('--time_budget', type=float, default=None,
+        help="Anytime analysis: computes safe bounds first and refines them core by core until the "
+             "time budget (in seconds) expires. The outputs mark the refined results.")
+options.parser.add_argument('--refine_order', type=str, default='load', choices=anytime.ORDERS,
+        help="Order of the refinement in the anytime analysis (most loaded core or largest chain latency first).")
+options.parser.add_argument('--instrument_output', type=str, default=None,
+        help="Records phase timings and busy-window statistics and writes them to given file (CSV for .csv, JSON otherwise).")
+
+MODES = ['implicit', 'let']
+
+def get_modes():
+    if options.get_opt('modes') is None:
+        return ['let'] if options.get_opt('let_mode') else ['implicit']
+
+    modes = [m.strip() for m in options.get_opt('modes').split(',')]
+    for m in modes:
+        if m not in MODES:
+            raise ValueError("unknown mode %s" % m)
+    return modes
+
+def output_file(option, suffix=''):
+    filename = options.get_opt(option)
+    if filename is None or not suffix:
+        return filename
+
+    root, ext = os.path.splitext(filename)
+    return root + suffix + ext
 
-def print_wcrt_results(s, task_results=None):
+WCRT_COLUMNS = ['Task', 'Resource', 'Prio', 'WCET', 'BCET', 'PERIOD',
+                'WCRT', 'readWCET', 'execWCET', 'writeWCET', 'readBCET', 'execBCET', 'writeBCET']
+
+def wcrt_columns():
+    if options.get_opt('time_budget') is not None:
+        # mark the refined results of the anytime analysis
+        return WCRT_COLUMNS + ['Refined']
+    return WCRT_COLUMNS
+
+def print_wcrt_results(res):
     if options.get_opt('print_results'):
         print("Result:")
-        print("Task;Resource;Prio;WCET;BCET;PERIOD;WCRT;readWCET;execWCET;writeWCET;readBCET;execBCET;writeBCET;")
-        for r in sorted(s.resources, key=str):
-            if r.name != "M1":
-                for t in sorted(r.tasks, key=str):
-                    if not isinstance(t, waters_model.LETTask):
-                        tr = task_results[t]
-                        period = t.in_event_model.P
-                        print("%s;%s;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d" % (t.name, t.resource.name, t.scheduling_parameter, t.wcet, t.bcet, period, tr.wcrt, tr.readWCET, tr.execWCET, tr.writeWCET, tr.readBCET, tr.execBCET, tr.writeBCET))
-                    #period = t.in_event_model.base_event_model.P
-        for r in sorted(s.resources, key=str):
-            if r.name != "M1":
-                print("Load on %s: %s" % (r.name, r.load()))
-
-def write_wcrt_results(system, task_results):
-    if options.get_opt('wcrt_output') is not None:
-        with open(options.get_opt('wcrt_output'), 'w+') as csvfile:
-            writer = csv.writer(csvfile, delimiter=options.get_opt('delimiter'))
-            writer.writerow(['Task', 'Resource', 'Prio', 'WCET', 'BCET', 'PERIOD', 
-                             'WCRT', 'readWCET', 'execWCET', 'writeWCET', 'readBCET', 'execBCET', 'writeBCET'])
-
-
-            for r in sorted(system.resources, key=str):
-                if not isinstance(r, waters_model.MemoryResource):
-                    for t in sorted(r.tasks, key=str):
-                        tr = task_results[t]
-                        t.update_execution_time(task_results)                            
-                        if isinstance(t.in_event_model, waters_model.CorrelatedAccessEventModel):
-                            period = t.in_event_model.base_event_model.P
-                            readWCET  = 0
-                            writeWCET = 0
-                            execWCET  = 0
-                            readBCET  = 0
-                            writeBCET = 0
-                            execBCET  = 0
-                        else:
-                            period    = t.in_event_model.P
-                            readWCET  = tr.readWCET
-                            writeWCET = tr.writeWCET
-                            execWCET  = tr.execWCET
-                            readBCET  = tr.readBCET
-                            writeBCET = tr.writeBCET
-                            execBCET  = tr.execBCET
-
-                        writer.writerow([t.name, t.resource.name, t.scheduling_parameter, t.wcet, t.bcet, period,
-                            tr.wcrt, readWCET, execWCET, writeWCET, readBCET, execBCET, writeBCET])
-
-def calc_and_write_latencies(chains, task_results):
-    writer = None
-    if options.get_opt('lat_output'):
-        csvfile = open(options.get_opt('lat_output'), 'w+')
-        writer = csv.writer(csvfile, delimiter=options.get_opt('delimiter'))
-        writer.writerow(['Name', 'Data Age', 'Reaction Time'])
+        print("".join(c + ";" for c in wcrt_columns()))
+        for row in res.tasks.rows(wcrt_columns(), where={'Kind' : results.TASK}):
+            print("%s;%s;" % tuple(row[:2]) + ";".join("%d" % v for v in row[2:]))
+        for name, load in res.resources.rows(['Resource', 'Load']):
+            print("Load on %s: %s" % (name, load))
 
+def print_memory_overhead(res):
     if options.get_opt('print_results'):
-        print("Analysing cause-effect chain latencies:")
-    
-    for chain in chains:
-        details_age = dict()
-        details_rt = dict()
-        age = path_analysis.cause_effect_chain_data_age(chain, task_results, details_age)
-        rt  = path_analysis.cause_effect_chain_reaction_time(chain, task_results, details_rt)
+        print("[Task];[Resource];write;read;GRAM")
+        for row in res.memory.rows():
+            print("%s;%s;%d;%d;%d;%d" % tuple(row))
+
+def write_wcrt_results(res, outfile):
+    """ Writes the WCRT results as CSV (only reads the results, hence it can be run as background artifact). """
+    res.write_csv('tasks', outfile, columns=wcrt_columns(), delimiter=options.get_opt('delimiter'))
 
-        if options.get_opt('print_results'):
+def calc_latencies(chains, task_results):
+    return waters_analysis.chain_latencies(chains, task_results)
+
+def print_latencies(latencies):
+    if options.get_opt('print_results'):
+        print("Analysing cause-effect chain latencies:")
+        for (chain, age, rt, details_age, details_rt) in latencies:
             print("%s: data age=%d; reaction time=%d" % (chain.name, age, rt))
             print(" data age details:")
             for (entry, value) in details_age.items():
@@ -117,57 +143,151 @@ def calc_and_write_latencies(chains, task_results):
             for (entry, value) in details_rt.items():
                 print("   %s:\t\t%d" % (entry, value))
 
-        if writer is not None:
-            writer.writerow([chain.name, age, rt])
+def write_latencies(res, outfile):
+    columns = ['Name', 'Data Age', 'Reaction Time']
+    if options.get_opt('time_budget') is not None:
+        columns.append('Refined')
+    res.write_csv('chains', outfile, columns=columns, delimiter=options.get_opt('delimiter'))
+
+def write_memory_overhead(res, outfile):
+    res.write_csv('memory', outfile, delimiter=options.get_opt('delimiter'))
+
+def compare_modes(mode_results, pipeline):
+    """ Prints/writes the WCRT and latency deltas between the first and the second analysed mode. """
+    (mode_a, res_a), (mode_b, res_b) = mode_results[:2]
+
+    rows = list()
+    wcrts_b = dict(res_b.tasks.rows(['Task', 'WCRT'], where={'Kind' : results.TASK}))
+    for name, wcrt in sorted(res_a.tasks.rows(['Task', 'WCRT'], where={'Kind' : results.TASK})):
+        rows.append(['WCRT', name, wcrt, wcrts_b[name], wcrts_b[name] - wcrt])
+
+    lat_b = dict((name, (age, rt)) for name, age, rt in res_b.chains.rows(['Name', 'Data Age', 'Reaction Time']))
+    for name, age, rt in sorted(res_a.chains.rows(['Name', 'Data Age', 'Reaction Time'])):
+        rows.append(['Data Age', name, age, lat_b[name][0], lat_b[name][0] - age])
+        rows.append(['Reaction Time', name, rt, lat_b[name][1], lat_b[name][1] - rt])
+
+    header = ['Metric', 'Name', mode_a, mode_b, 'Delta']
+    if options.get_opt('print_results'):
+        print("Comparison %s vs. %s:" % (mode_a, mode_b))
+        print(";".join(header))
+        for row in rows:
+            print("%s;%s;%d;%d;%d" % tuple(row))
+
+    if options.get_opt('cmp_output') is not None:
+        pipeline.add('cmp_output', artifacts.write_csv, options.get_opt('cmp_output'), header, rows,
+                delimiter=options.get_opt('delimiter'))
 
 def analyze_model(filename):  
+    modes = get_modes()
+
+    # parse once with implicit communication, the LET system is derived as ModelVariant
     amt_parser = atp.AmaltheaParser(filename, scale = options.get_opt('scale'), 
-                                    letMode = options.get_opt('let_mode'),
-                                    letTaskWCET = options.get_opt('let_task_wcet'))
+                                    letMode = False,
+                                    letTaskWCET = options.get_opt('let_task_wcet'),
+                                    readPhases = atp.read_phases_arg(options.get_opt('read_phases')))
     s = amt_parser.parse_amalthea()
-    amt_parser.analyzeMemoryOverhead(
-            print_results=options.get_opt('print_results'),
-            delimiter=options.get_opt('delimiter'),
-            outfile=options.get_opt('mem_output'))
-    amt_parser.analyzeTaskInteractions()
-    amt_parser.analyzeCoreInteractions()
-    
-    try:
-        # plot the system graph to visualize the architecture
-        g = graph.graph_system(s, 'waters.pdf')
-    except Exception:
-        # gracefully pass for machines without matplotlib
-        pass
-    
+
+    # output artifacts are generated in the background once their data is ready
+    pipeline = artifacts.ArtifactPipeline(background=not options.get_opt('sync_artifacts'))
+
+    overhead = amt_parser.memory_overhead()
+
+    systems = list()
+    chains = list()
+    for mode in modes:
+        if mode == 'let':
+            variant = amt_parser.create_LET_variant()
+            systems.append(variant.system)
+            chains.append(variant.effect_chains(amt_parser.eventChains))
+        else:
+            systems.append(s)
+            chains.append(amt_parser.eventChains)
+
     ######################################
     # Perform the response time analysis #
     ######################################
-    # We perform two runs of the analysis:
-    # The first run is for getting the response times of the memory task which are
-    # then used to update the execution times of the runnable tasks.
-    # The second run then results in the correct response times of the runnable tasks.
-    # As the WCRTs of the memory tasks are independent from any event models, they do not
-    # change in the second run.
-    ######################################
+    logger.info("Performing analysis")
+    if options.get_opt('time_budget') is None:
+        all_task_results = waters_analysis.analyze_systems(systems,
+                workers=None if options.get_opt('parallel') else 1)
+    else:
+        all_task_results = analyze_anytime(systems, chains)
+    logger.info("event model memo: %(hits)d hits, %(misses)d misses (hit rate %(hit_rate).2f)",
+            waters_model.event_model_memo.stats())
 
-    print("Performing analysis")
-    task_results = analysis.analyze_system(s, progress_hook=None)
-    print("Update Execution Times")
-    for r in sorted(s.resources, key=str):
-        for t in sorted(r.tasks, key=str):
-            if isinstance(t, waters_model.RunnableTask):
-                t.update_execution_time(task_results = task_results)
-            
-    print("Second analysis run")
-    task_results = analysis.analyze_system(s, progress_hook=None)
+    mode_results = list()
+    for mode, system, mode_chains, task_results in zip(modes, systems, chains, all_task_results):
+        suffix = _suffix(mode, modes)
+        if len(modes) > 1 and options.get_opt('print_results'):
+            print("Results (%s):" % mode)
 
-    print_wcrt_results(s, task_results)
+        logger.info("....finished (%s)", mode)
 
-    write_wcrt_results(s, task_results)
-    
-    print("....finished")
+        latencies = calc_latencies(mode_chains, task_results)
+
+        # all outputs read from the results, which are collected once
+        res = results.build(system, task_results, latencies, overhead)
+        mode_results.append((mode, res))
+
+        print_memory_overhead(res)
+        print_wcrt_results(res)
+        print_latencies(latencies)
 
-    calc_and_write_latencies(amt_parser.eventChains, task_results)
+        if options.get_opt('mem_output') is not None:
+            outfile = output_file('mem_output', suffix)
+            pipeline.add(outfile, write_memory_overhead, res, outfile)
+        if options.get_opt('wcrt_output') is not None:
+            outfile = output_file('wcrt_output', suffix)
+            pipeline.add(outfile, write_wcrt_results, res, outfile)
+        if options.get_opt('lat_output') is not None:
+            outfile = output_file('lat_output', suffix)
+            pipeline.add(outfile, write_latencies, res, outfile)
+        if options.get_opt('jsonl_output') is not None:
+            outfile = output_file('jsonl_output', suffix)
+            pipeline.add(outfile, res.write_jsonl, outfile)
+        if options.get_opt('binary_output') is not None:
+            outfile = output_file('binary_output', suffix)
+            pipeline.add(outfile, res.write_binary, outfile)
+
+    if len(mode_results) > 1:
+        compare_modes(mode_results, pipeline)
+
+    if options.get_opt('task_dot') is not None:
+        pipeline.add('task_dot', artifacts.write_dot, amt_parser.task_interactions(),
+                options.get_opt('task_dot'), scale=1000.0)
+    if options.get_opt('core_dot') is not None:
+        pipeline.add('core_dot', artifacts.write_dot, amt_parser.core_interactions(),
+                options.get_opt('core_dot'), scale=2500.0)
+    if options.get_opt('graph_output') is not None:
+        # plot the system graph to visualize the architecture (requires matplotlib)
+        pipeline.add('graph_output', artifacts.graph_system, s, options.get_opt('graph_output'))
+
+    failed = pipeline.close()
+    if failed:
+        logger.warning("failed to generate %s", ", ".join(failed))
+
+def analyze_anytime(systems, chains):
+    """ Performs the anytime analysis of the given systems, which share the time budget. """
+    deadline = time.time() + options.get_opt('time_budget')
+
+    analyses = list()
+    for system, mode_chains in zip(systems, chains):
+        a = anytime.AnytimeAnalysis(system, mode_chains, order=options.get_opt('refine_order'))
+        a.bounds()
+        analyses.append(a)
+
+    for i, a in enumerate(analyses):
+        # split the remaining budget between the remaining systems
+        remaining = len(analyses) - i
+        a.refine(deadline=time.time() + max(0, deadline - time.time()) / remaining)
+        logger.info("%d of %d cores refined", len(a.refined), len(a.cores))
+
+    return [a.task_results for a in analyses]
+
+def _suffix(mode, modes):
+    if len(modes) > 1 and mode == 'let':
+        return '-let'
+    return ''
 
 def hook(analysis_state):
     print (len(analysis_state.dirtyTasks))
@@ -176,6 +296,15 @@ def hook(analysis_state):
 if __name__ == "__main__":
     # initialize pyCPA's default command line arguments
     options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    instr = None
+    if options.get_opt('instrument_output') is not None:
+        instr = instrumentation.enable()
 
     # parse and analyze input model
     analyze_model(options.get_opt('model'))
+
+    if instr is not None:
+        instrumentation.disable()
+        instr.write(options.get_opt('instrument_output'), options.get_opt('delimiter'))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script optimizes the LET parameters of an Almathea model (see waters.optimizer), i.e. the
+WCET and release slots of the LET tasks per core and the choice between LET and implicit
+communication per task, and writes the best configuration and its chain latencies as JSON.
+"""
+
+from waters import AmaltheaParser as atp
+from waters import optimizer
+from waters import log
+from pycpa import options
+
+import json
+import time
+
+options.parser.add_argument('--model', type=str, required=True,
+        help="Almathea model.")
+log.add_options(options.parser)
+options.parser.add_argument('--scale', type=float, default=0.7,
+        help="Scales execution times (?) in the given model (to render the system schedulable).")
+options.parser.add_argument('--let_task_wcet', type=int, default=50,
+        help="Initial execution time for LET Tasks")
+options.parser.add_argument('--wcet_candidates', type=str, default='25,50,100',
+        help="Comma-separated list of candidate LET task WCETs.")
+options.parser.add_argument('--slot_candidates', type=str, default='0',
+        help="Comma-separated list of candidate numbers of extra release slots of the LET tasks of a core.")
+options.parser.add_argument('--objective', type=str, default='data-age', choices=optimizer.OBJECTIVES,
+        help="Latency whose maximum over all chains is minimized.")
+options.parser.add_argument('--let_only', action='store_true',
+        help="Use LET communication for every task (only optimize the WCETs and slots).")
+options.parser.add_argument('--max_evaluations', type=int, default=1000,
+        help="Maximum number of evaluated configurations.")
+options.parser.add_argument('--output', type=str, default='results_let_optimization.json',
+        help="Writes the best configuration as JSON to given file.")
+
+if __name__ == "__main__":
+    # initialize pyCPA's default command line arguments
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    amt_parser = atp.AmaltheaParser(options.get_opt('model'), scale = options.get_opt('scale'))
+    amt_parser.parse_amalthea()
+
+    opt = optimizer.LETOptimizer(amt_parser,
+            wcet_candidates=[int(x) for x in options.get_opt('wcet_candidates').split(',')],
+            slot_candidates=[int(x) for x in options.get_opt('slot_candidates').split(',')],
+            objective=options.get_opt('objective'),
+            select_tasks=not options.get_opt('let_only'))
+
+    start = time.time()
+    initial = opt.evaluate(opt.initial_configuration(options.get_opt('let_task_wcet')))
+    best = opt.optimize(initial.config, max_evaluations=options.get_opt('max_evaluations'))
+    duration = time.time() - start
+
+    print("Initial cost: %s" % (initial.cost(options.get_opt('objective')),))
+    print("Best cost:    %s" % (best.cost(options.get_opt('objective')),))
+    print("%d evaluations in %.2fs (%d/%d core analyses/hits, %d/%d chain analyses/hits)" % (
+        opt.stats['evaluations'], duration, opt.stats['core_analyses'], opt.stats['core_hits'],
+        opt.stats['chain_analyses'], opt.stats['chain_hits']))
+
+    results = {'config'    : best.config.to_dict(),
+               'latency'   : dict((name, {'Data Age' : age, 'Reaction Time' : rt})
+                                  for name, (age, rt) in (best.latencies or {}).items()),
+               'initial'   : {'config' : initial.config.to_dict(),
+                              'cost'   : list(initial.cost(options.get_opt('objective')))},
+               'cost'      : list(best.cost(options.get_opt('objective'))),
+               'stats'     : opt.stats}
+    with open(options.get_opt('output'), 'w') as outfile:
+        json.dump(results, outfile, indent=1, sort_keys=True)
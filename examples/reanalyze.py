@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script analyses a new version of an Almathea model w.r.t. the stored results of a
+baseline version, i.e. only the resources and chains affected by the changes are re-analysed.
+Without a baseline, the model is fully analysed and the results can serve as baseline for the next version.
+"""
+
+from waters import analysis as waters_analysis
+from waters import AmaltheaParser as atp
+from waters import log
+from pycpa import options
+
+import json
+
+options.parser.add_argument('--model', type=str, required=True,
+        help="Almathea model.")
+log.add_options(options.parser)
+options.parser.add_argument('--baseline', type=str, default=None,
+        help="JSON results of the baseline model (as written by --output).")
+options.parser.add_argument('--output', type=str, required=True,
+        help="Writes the (full) results as JSON to given file.")
+options.parser.add_argument('--delta_output', type=str, default=None,
+        help="Writes the delta report as JSON to given file.")
+options.parser.add_argument('--let_mode', action='store_true',
+        help="Use LET communication.")
+options.parser.add_argument('--scale', type=float, default=0.7,
+        help="Scales execution times (?) in the given model (to render the system schedulable).")
+options.parser.add_argument('--let_task_wcet', type=int, default=50,
+        help="Constant execution time for LET Tasks")
+options.parser.add_argument('--read_phases', type=str, default='task',
+        help="Memory read phases of a task: task (a single phase), runnable (one phase per runnable) "
+             "or the number of labels per phase.")
+
+if __name__ == "__main__":
+    # initialize pyCPA's default command line arguments
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    params = {'scale'         : options.get_opt('scale'),
+              'let_mode'      : options.get_opt('let_mode'),
+              'let_task_wcet' : options.get_opt('let_task_wcet'),
+              'read_phases'   : atp.read_phases_arg(options.get_opt('read_phases'))}
+
+    if options.get_opt('baseline') is None:
+        results = waters_analysis.analyze_file(options.get_opt('model'), signature=True, **params)
+        report = None
+    else:
+        with open(options.get_opt('baseline')) as infile:
+            baseline = json.load(infile)
+        results, report = waters_analysis.reanalyze_file(options.get_opt('model'), baseline, **params)
+        print("Re-analysed resources: %s" % ", ".join(report['resources']))
+        print("Re-analysed chains: %d of %d" % (len(report['chains']), len(results['latency'])))
+
+    with open(options.get_opt('output'), 'w') as outfile:
+        json.dump(results, outfile, indent=1, sort_keys=True)
+
+    if report is not None and options.get_opt('delta_output') is not None:
+        with open(options.get_opt('delta_output'), 'w') as outfile:
+            json.dump(report, outfile, indent=1, sort_keys=True)
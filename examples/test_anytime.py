@@ -0,0 +1,51 @@
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import anytime
+from waters import generator
+
+import os
+import shutil
+import tempfile
+
+def check_bounds(filename, order='load'):
+    """ Checks that the bounds of the anytime analysis (and the latencies computed from them) are
+        not smaller than the exact results at every step of the refinement.
+    """
+    amt_parser = atp.AmaltheaParser(filename)
+    exact_results = waters_analysis.analyze_system(amt_parser.parse_amalthea())
+    exact_wcrt = dict((t.name, tr.wcrt) for t, tr in exact_results.items())
+    exact_latencies = dict((chain.name, (age, rt)) for (chain, age, rt, details_age, details_rt)
+            in waters_analysis.chain_latencies(amt_parser.eventChains, exact_results))
+
+    amt_parser = atp.AmaltheaParser(filename)
+    a = anytime.AnytimeAnalysis(amt_parser.parse_amalthea(), amt_parser.eventChains, order=order)
+
+    def check(a, core=None):
+        for t, tr in a.task_results.items():
+            assert tr.wcrt >= exact_wcrt[t.name], "%s: bound %d < WCRT %d" % (t.name, tr.wcrt, exact_wcrt[t.name])
+            if anytime.is_refined(tr):
+                assert tr.wcrt == exact_wcrt[t.name], "%s: refined WCRT differs" % t.name
+        for (chain, age, rt, details_age, details_rt) in a.latencies():
+            assert age >= exact_latencies[chain.name][0], "%s: data age below exact latency" % chain.name
+            assert rt >= exact_latencies[chain.name][1], "%s: reaction time below exact latency" % chain.name
+
+    a.bounds()
+    check(a)
+    assert a.refine(callback=check)
+    for (chain, age, rt, details_age, details_rt) in a.latencies():
+        assert (age, rt) == exact_latencies[chain.name], "%s: refined latency differs" % chain.name
+
+def test_bounds():
+    directory = tempfile.mkdtemp()
+    try:
+        for seed in range(3):
+            filename = generator.generate_model(os.path.join(directory, 'model-%d.xml' % seed),
+                    cores=3, tasks=12, runnables_per_task=4, labels=200, seed=seed)
+            for order in anytime.ORDERS:
+                check_bounds(filename, order)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    test_bounds()
+    print("anytime bounds OK")
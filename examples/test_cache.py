@@ -0,0 +1,63 @@
+from waters import analysis as waters_analysis
+from waters import cache as waters_cache
+from waters import generator
+
+import os
+import shutil
+import tempfile
+
+def test_key():
+    """ Checks that the results of analyze_file() are stored under cache_key(). """
+    directory = tempfile.mkdtemp()
+    try:
+        filename = generator.generate_model(os.path.join(directory, 'model.xml'),
+                cores=2, tasks=6, runnables_per_task=3, labels=50)
+        cache = waters_cache.ResultCache(os.path.join(directory, 'cache'))
+
+        results = waters_analysis.analyze_file(filename, cache=cache, read_phases='runnable')
+        key = waters_analysis.cache_key(cache, filename, read_phases='runnable')
+        assert cache.get(key) == results
+
+        # other parameters use other keys
+        for params in ({}, {'scale' : 2.0}, {'let_mode' : True}, {'signature' : True}, {'read_phases' : 2}):
+            other = waters_analysis.cache_key(cache, filename, **params)
+            assert other != key and cache.get(other) is None
+
+        # analyze_file() returns the stored results
+        cache.put(key, {'cached' : True})
+        assert waters_analysis.analyze_file(filename, cache=cache, read_phases='runnable') == {'cached' : True}
+
+        # the key depends on the content of the model
+        with open(filename, 'a') as f:
+            f.write('\n')
+        assert waters_analysis.cache_key(cache, filename, read_phases='runnable') != key
+    finally:
+        shutil.rmtree(directory)
+
+def test_eviction():
+    """ Checks that the least recently used entries are evicted. """
+    directory = tempfile.mkdtemp()
+    try:
+        results = {'value' : 'x' * 100}
+        cache = waters_cache.ResultCache(directory)
+        cache.put('a', results)
+        size = os.path.getsize(os.path.join(directory, 'a.json'))
+
+        cache.max_size = 2 * size
+        cache.put('b', results)
+        os.utime(os.path.join(directory, 'a.json'), (1000, 1000))
+        os.utime(os.path.join(directory, 'b.json'), (2000, 2000))
+
+        # looking up 'a' makes 'b' the least recently used entry
+        assert cache.get('a') == results
+        cache.put('c', results)
+        assert cache.get('b') is None
+        assert cache.get('a') == results and cache.get('c') == results
+        assert sorted(os.listdir(directory)) == ['a.json', 'c.json']
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    test_key()
+    test_eviction()
+    print("result cache OK")
@@ -0,0 +1,86 @@
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import diff
+from waters import generator
+
+import os
+import copy
+import shutil
+import tempfile
+
+def parse(filename):
+    amt_parser = atp.AmaltheaParser(filename)
+    amt_parser.parse_amalthea()
+    return amt_parser
+
+def test_signature_diff():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = generator.generate_model(os.path.join(directory, 'model.xml'),
+                cores=2, tasks=6, runnables_per_task=3, labels=50)
+        old = parse(filename).signature()
+        assert diff.ModelDiff(old, copy.deepcopy(old)).is_empty()
+
+        # execution time of a runnable
+        new = copy.deepcopy(old)
+        name = sorted(new['runnables'])[0]
+        new['runnables'][name]['wcet'] += 1
+        d = diff.ModelDiff(old, new)
+        task = new['runnables'][name]['task']
+        assert d.runnables == set([name]) and not d.tasks and not d.cores
+        assert d.affected_tasks() == set([task])
+        assert d.affected_resources() == set([new['tasks'][task]['core']])
+
+        # clock of a core (the execution times of the runnables stay the same)
+        new = copy.deepcopy(old)
+        core = sorted(new['cores'])[0]
+        new['cores'][core]['time_per_instruction'] *= 2
+        d = diff.ModelDiff(old, new)
+        assert d.cores == set([core]) and not d.ecus and not d.is_empty()
+        assert d.affected_tasks() == set(name for name, t in new['tasks'].items() if t['core'] == core)
+
+        # core moved to another ECU: all cores of both ECUs are affected
+        new = copy.deepcopy(old)
+        new['cores'][core]['ecu'] = 'ECU_new'
+        d = diff.ModelDiff(old, new)
+        assert d.cores == set([core]) and d.ecus == set([old['cores'][core]['ecu'], 'ECU_new'])
+        assert d.affected_cores() == set(old['cores'])
+        assert d.affected_tasks() == set(new['tasks'])
+    finally:
+        shutil.rmtree(directory)
+
+def test_reanalysis():
+    """ Checks that the re-analysis of a modified model matches its full analysis. """
+    directory = tempfile.mkdtemp()
+    try:
+        baseline_file = generator.generate_model(os.path.join(directory, 'baseline.xml'),
+                cores=2, tasks=8, runnables_per_task=3, labels=100, ecus=2)
+        # same model with other clocks
+        clock_file = generator.generate_model(os.path.join(directory, 'clock.xml'),
+                cores=2, tasks=8, runnables_per_task=3, labels=100, ecus=2, frequency=250000000)
+
+        baseline = waters_analysis.analyze_file(baseline_file, signature=True)
+        assert baseline['parameters'] == {'scale' : 1.0, 'let_mode' : False, 'let_task_wcet' : 50,
+                                          'read_phases' : None}
+
+        results, report = waters_analysis.reanalyze_file(baseline_file, baseline)
+        assert results == baseline
+        assert not report['resources'] and not report['chains']
+
+        results, report = waters_analysis.reanalyze_file(clock_file, baseline)
+        assert results == waters_analysis.analyze_file(clock_file, signature=True)
+        assert report['diff']['cores'] and report['resources']
+
+        try:
+            waters_analysis.reanalyze_file(baseline_file, baseline, scale=2.0)
+        except ValueError:
+            pass
+        else:
+            assert False, "re-analysis with other parameters than the baseline"
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    test_signature_diff()
+    test_reanalysis()
+    print("model diff OK")
@@ -0,0 +1,45 @@
+from waters import let
+from waters import model as waters_model
+from pycpa import model
+
+import random
+
+def let_task(name, period, offset, wcet, jitter=0):
+    task = waters_model.RunnableTask(name, scheduling_parameter=1)
+    task.in_event_model = model.PJdEventModel(P=period, J=jitter)
+    return waters_model.LETTask(task, wcet=wcet, offset=offset)
+
+def brute_force_demand(let_tasks, w):
+    """ Sums up the WCETs of all releases offset + k*P (for any integer k) within [0, w). """
+    demand = 0
+    for t in let_tasks:
+        P = t.in_event_model.base_event_model.P
+        offset = t.in_event_model.offset
+        demand += t.wcet * len([k for k in range(-offset // P - 1, w // P + 1) if 0 <= offset + k * P < w])
+    return demand
+
+def test_demand():
+    rnd = random.Random(0)
+    for i in range(20):
+        periods = [rnd.choice([10, 20, 25, 50, 100]) for j in range(rnd.randint(1, 4))]
+        let_tasks = [let_task('Task_%d' % j, P, rnd.randint(0, 2 * P), rnd.randint(1, 5))
+                for j, P in enumerate(periods)]
+        pattern = let.release_pattern(let_tasks)
+        assert pattern is not None
+
+        for w in range(-5, 3 * pattern.hyperperiod + 7):
+            assert pattern.demand(w) == brute_force_demand(let_tasks, w), \
+                "periods %s, w=%d: %d != %d" % (periods, w, pattern.demand(w), brute_force_demand(let_tasks, w))
+
+def test_no_pattern():
+    # jitter
+    assert let.release_pattern([let_task('Task_0', 10, 0, 1), let_task('Task_1', 20, 0, 1, jitter=5)]) is None
+    # too many releases per hyperperiod
+    let_tasks = [let_task('Task_0', 997, 0, 1), let_task('Task_1', 991, 0, 1)]
+    assert let.release_pattern(let_tasks, max_releases=100) is None
+    assert let.release_pattern(let_tasks) is not None
+
+if __name__ == "__main__":
+    test_demand()
+    test_no_pattern()
+    print("LET release pattern OK")
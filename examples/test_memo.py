@@ -0,0 +1,85 @@
+from waters import model as waters_model
+from pycpa import model
+
+import gc
+import threading
+
+def test_lru():
+    memo = waters_model.EventModelMemo(max_size=3)
+    em = model.PJdEventModel(P=100, J=0)
+
+    for w in (1, 2, 3):
+        assert memo.eta_plus(em, w) == em.eta_plus(w)
+    assert memo.eta_plus(em, 1) == em.eta_plus(1)
+    assert (memo.hits, memo.misses) == (1, 3)
+
+    # evicts the least recently used value (w=2)
+    memo.delta_plus(em, 2)
+    assert memo.stats()['size'] == 3
+    memo.eta_plus(em, 1)
+    memo.eta_plus(em, 3)
+    assert (memo.hits, memo.misses) == (3, 4)
+    memo.eta_plus(em, 2)
+    assert (memo.hits, memo.misses) == (3, 5)
+
+def test_correlated():
+    """ The correlated event models of a stimulus share the values of their base event model. """
+    memo = waters_model.EventModelMemo()
+    em = model.PJdEventModel(P=100, J=10)
+    correlated = waters_model.CorrelatedAccessEventModel(em, 20)
+
+    assert memo.delta_plus(em, 2) == em.delta_plus(2)
+    assert memo.delta_plus(correlated, 2) == em.delta_plus(2)
+    assert (memo.hits, memo.misses) == (1, 1)
+
+def test_weakref():
+    """ The values of an event model are removed once it is garbage collected. """
+    memo = waters_model.EventModelMemo()
+    em = model.PJdEventModel(P=100, J=0)
+    other = model.PJdEventModel(P=50, J=0)
+    for w in range(10):
+        memo.eta_plus(em, w)
+    memo.eta_plus(other, 1)
+    assert memo.stats()['size'] == 11
+
+    del em
+    gc.collect()
+    memo.eta_plus(other, 1)
+    assert memo.stats()['size'] == 1
+
+    # a new event model (possibly with the id of the collected one) does not hit the old values
+    em = model.PJdEventModel(P=10, J=0)
+    assert memo.eta_plus(em, 25) == em.eta_plus(25)
+
+    memo.invalidate(other)
+    assert memo.stats()['size'] == 1
+    memo.invalidate()
+    assert memo.stats()['size'] == 0
+
+def test_threads():
+    memo = waters_model.EventModelMemo(max_size=20)
+    event_models = [model.PJdEventModel(P=10 * (i + 1), J=i) for i in range(4)]
+    errors = list()
+
+    def lookup():
+        for k in range(1000):
+            em = event_models[k % len(event_models)]
+            if memo.eta_plus(em, k % 30) != em.eta_plus(k % 30):
+                errors.append(k)
+
+    threads = [threading.Thread(target=lookup) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = memo.stats()
+    assert not errors
+    assert stats['hits'] + stats['misses'] == 4000 and stats['size'] <= 20
+
+if __name__ == "__main__":
+    test_lru()
+    test_correlated()
+    test_weakref()
+    test_threads()
+    print("event model memo OK")
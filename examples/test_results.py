@@ -0,0 +1,78 @@
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import generator
+from waters import results as waters_results
+
+import os
+import csv
+import json
+import shutil
+import tempfile
+
+def analysis_results(filename):
+    amt_parser = atp.AmaltheaParser(filename)
+    s = amt_parser.parse_amalthea()
+    task_results = waters_analysis.analyze_system(s)
+    return waters_results.build(s, task_results, waters_analysis.chain_latencies(amt_parser.eventChains, task_results),
+            amt_parser.memory_overhead())
+
+def convert(kind, value):
+    """ Converts a CSV field into the type of its column. """
+    return {'str' : str, 'int' : int, 'float' : float, 'bool' : lambda v: bool(int(v))}[kind](value)
+
+def test_round_trip():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = generator.generate_model(os.path.join(directory, 'model.xml'),
+                cores=2, tasks=6, runnables_per_task=3, labels=50)
+        results = analysis_results(filename)
+        for name, table in results.tables.items():
+            assert len(table) > 0, "table %s is empty" % name
+
+        for name, table in results.tables.items():
+            outfile = os.path.join(directory, name + '.csv')
+            results.write_csv(name, outfile)
+            with open(outfile) as f:
+                rows = list(csv.reader(f, delimiter='\t'))
+            assert rows[0] == [column for column, kind in table.schema]
+            assert [[convert(kind, v) for (column, kind), v in zip(table.schema, row)] for row in rows[1:]] == table.rows()
+
+        outfile = os.path.join(directory, 'results.jsonl')
+        results.write_jsonl(outfile)
+        loaded = waters_results.AnalysisResults()
+        with open(outfile) as f:
+            for line in f:
+                entry = json.loads(line)
+                table = loaded.tables[entry.pop('table')]
+                table.append([entry[column] for column, kind in table.schema])
+        for name, table in results.tables.items():
+            assert loaded.tables[name].rows() == table.rows(), "table %s differs" % name
+
+        outfile = os.path.join(directory, 'results.bin')
+        results.write_binary(outfile)
+        loaded = waters_results.load_binary(outfile)
+        for name, table in results.tables.items():
+            for column, kind in table.schema:
+                assert list(loaded.tables[name].column(column)) == table.column(column), \
+                    "column %s of table %s differs" % (column, name)
+    finally:
+        shutil.rmtree(directory)
+
+def test_types():
+    table = waters_results.Table(waters_results.CHAINS)
+    table.append(['Chain', 10.0, 20, 1])
+    assert table.rows() == [['Chain', 10, 20, True]]
+    for row in (['Chain', 10.5, 20, True], ['Chain', float('inf'), 20, True],
+                ['Chain\0', 10, 20, True], ['Chain', 2**63, 20, True]):
+        try:
+            table.append(row)
+        except ValueError:
+            pass
+        else:
+            assert False, "%r accepted" % row
+    assert len(table) == 1
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_types()
+    print("analysis results OK")
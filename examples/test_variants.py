@@ -0,0 +1,73 @@
+from waters import AmaltheaParser as atp
+from waters import analysis as waters_analysis
+from waters import generator
+from waters import model as waters_model
+
+import os
+import shutil
+import tempfile
+
+def results_by_name(task_results):
+    return dict((t.name, (tr.wcrt, tr.bcrt)) for t, tr in task_results.items())
+
+def check_copy_on_write(filename):
+    """ Checks that modifying a variant copies the modified resource only and leaves the base
+        system (and its analysis results) untouched.
+    """
+    amt_parser = atp.AmaltheaParser(filename)
+    s = amt_parser.parse_amalthea()
+    base_results = results_by_name(waters_analysis.analyze_system(s))
+
+    task = sorted((t for t in amt_parser.cpa_tasks.values() if t.runnables), key=str)[0]
+    runnable = task.runnables[0]
+    wcet = runnable.wcet
+    other_cores = [r for r in amt_parser.cores.values() if r is not task.resource]
+
+    variant = amt_parser.create_variant()
+    new_runnable = variant.writable_runnable(runnable)
+    new_runnable.wcet += 1
+    new_task = variant.task(task)
+
+    # the task, its resource and the runnable were copied, the base objects are unchanged
+    assert new_task is not task and new_runnable is not runnable
+    assert new_runnable.parent_task is new_task and new_runnable in new_task.runnables
+    assert variant.is_copied(new_task.resource) and not variant.is_copied(task.resource)
+    assert runnable.wcet == wcet and runnable in task.runnables
+    assert task.resource in s.resources and task.resource not in variant.system.resources
+    assert new_task.resource in variant.system.resources and new_task.resource not in s.resources
+
+    # the other cores are shared
+    for r in other_cores:
+        assert variant.resource(r) is r and r in variant.system.resources
+
+    # a derived variant copies on write as well
+    derived = variant.derive()
+    assert derived.task(task) is new_task
+    if other_cores:
+        other = sorted(other_cores[0].tasks, key=str)[0]
+        new_other = derived.writable_task(other)
+        new_other.scheduling_parameter += 1
+        assert new_other is not other and variant.task(other) is other
+        assert derived.task(task) is new_task
+
+    variant_results = results_by_name(waters_analysis.analyze_system(variant.system))
+    assert results_by_name(waters_analysis.analyze_system(s)) == base_results
+    assert variant_results[task.name][0] >= base_results[task.name][0]
+    for r in other_cores:
+        for t in r.tasks:
+            if isinstance(t, waters_model.RunnableTask):
+                assert variant_results[t.name] == base_results[t.name], "%s: results differ" % t.name
+
+def test_copy_on_write():
+    directory = tempfile.mkdtemp()
+    try:
+        for seed in range(3):
+            filename = generator.generate_model(os.path.join(directory, 'model-%d.xml' % seed),
+                    cores=3, tasks=12, runnables_per_task=4, labels=200, seed=seed)
+            check_copy_on_write(filename)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    test_copy_on_write()
+    print("model variants OK")
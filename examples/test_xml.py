@@ -1,8 +1,28 @@
 from waters import AmaltheaParser as atp
+from waters import generator
 from pycpa import analysis
 
+import os
+import shutil
+import tempfile
+import contextlib
+
 TESTFILE='Test.xml'
 
+@contextlib.contextmanager
+def model_file():
+    """ Yields TESTFILE or (if it does not exist) a small synthetic model in a temporary directory. """
+    if os.path.exists(TESTFILE):
+        yield TESTFILE
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        yield generator.generate_model(os.path.join(directory, 'Test-synthetic.xml'),
+                cores=2, tasks=6, runnables_per_task=3, labels=50)
+    finally:
+        shutil.rmtree(directory)
+
 # def test_label_size(xml_file=None):
 #     swm = ET.parse(xml_file).getroot().find('swModel')
 # 
@@ -14,8 +34,9 @@ TESTFILE='Test.xml'
 #             print (lname, lsize)
 
 def test_parser():
-    amt_parser = atp.AmaltheaParser(TESTFILE)
-    s = amt_parser.parse_amalthea()
+    with model_file() as filename:
+        amt_parser = atp.AmaltheaParser(filename)
+        s = amt_parser.parse_amalthea()
 
     for r in s.resources:
         for t in r.tasks:
@@ -29,8 +50,9 @@ def test_parser():
 
 def print_task_model():
     
-    amt_parser = atp.AmaltheaParser(TESTFILE)
-    s = amt_parser.parse_amalthea()
+    with model_file() as filename:
+        amt_parser = atp.AmaltheaParser(filename)
+        s = amt_parser.parse_amalthea()
      
     for r in s.resources:
         for t in r.tasks:
@@ -1,2 +1 @@
-./examples/challenge.py  --model examples/Challenge.xml --wcrt_output results_wcrt.csv --mem_output results_mem.csv --print_results --lat_output results_lat.csv > analysis-implicit.log
-./examples/challenge.py  --model examples/Challenge.xml --wcrt_output results_wcrt-let.csv --mem_output results_mem-let.csv --print_results --lat_output results_lat-let.csv --let_mode > analysis-let.log
+./examples/challenge.py  --model examples/Challenge.xml --modes implicit,let --wcrt_output results_wcrt.csv --mem_output results_mem.csv --print_results --lat_output results_lat.csv --cmp_output results_cmp.csv --task_dot task_interactions.dot --core_dot core_interactions.dot --graph_output waters.pdf --log_level INFO > analysis.log 2>&1
@@ -13,22 +13,38 @@ from __future__ import print_function
 
 import xml.etree.ElementTree as ET
 import copy
-import csv
 
 from pycpa import model
 from waters import model as waters_model
-from pycpa import analysis
 from waters import schedulers
-from pycpa import path_analysis
-from pycpa import graph
-from pycpa import options
+from waters import variants
+from waters import diff
+from waters import instrumentation
+from waters import artifacts
+from waters import memory
+from waters import results as waters_results
 from pycpa import util
 from math import ceil
+import logging
+
+logger = logging.getLogger(__name__)
 
 xsi='{http://www.w3.org/2001/XMLSchema-instance}'
 
+def read_phases_arg(value):
+    """ Converts the command line value of the read phases ('task', 'runnable' or the number of
+        labels per phase) into the readPhases argument of the AmaltheaParser.
+    """
+    if value is None or value == 'task':
+        return None
+    elif value == 'runnable':
+        return value
+    elif value.isdigit() and int(value) > 0:
+        return int(value)
+    raise ValueError("invalid read phases: %s" % value)
+
 class AmaltheaParser(object):
-    def __init__(self, xml_file, letMode = False, scale = 1.0, letTaskWCET = 100):
+    def __init__(self, xml_file, letMode = False, scale = 1.0, letTaskWCET = 100, readPhases = None):
         self.xml_file = xml_file
         # generate an new system
         self.cpa_sys = model.System()
@@ -37,8 +53,12 @@ class AmaltheaParser(object):
         self.letMode = letMode
         self.scale = scale
         self.letTaskWCET = letTaskWCET
+        # granularity of the memory read phases of a task: None (a single phase for all read labels),
+        # 'runnable' (one phase per runnable) or the (maximum) number of labels per phase
+        self.readPhases = readPhases
 
-        root = ET.parse(self.xml_file).getroot()
+        with instrumentation.phase('xml_parse'):
+            root = ET.parse(self.xml_file).getroot()
         self.mappingModel= root.find('mappingModel')
         self.swm = root.find('swModel')
         self.hwModel = root.find('hwModel')
@@ -47,32 +67,102 @@ class AmaltheaParser(object):
 
         self.time_per_instruction = self.set_time_per_instruction() 
         self.cpa_labels= dict()
+        self.ecus = dict()
         self.cores = dict()
         self.cpa_tasks = dict()
         self.runnables = dict()
         
         self.eventChains = list()
         
+        # memory resource of the first ECU
         self.memoryResource = None
+
+        # memory.LabelAccessTable of the tasks (built on demand, reset when labels or tasks are added)
+        self._label_access_table = None
         
     
     def parse_amalthea(self):
         
-        self.add_resources()
-        self.add_labels()
-        self.add_tasks()
-        self.add_runnables()
-        self.bind_runnables_to_tasks()
-        self.bind_labels_to_runables_and_tasks()
-        self.bind_tasks_to_cores()
-        self.create_memory_tasks()
-        self.parse_effect_chains()
+        with instrumentation.phase('add_resources'):
+            self.add_resources()
+        with instrumentation.phase('add_labels'):
+            self.add_labels()
+        with instrumentation.phase('add_tasks'):
+            self.add_tasks()
+        with instrumentation.phase('add_runnables'):
+            self.add_runnables()
+        with instrumentation.phase('bind_runnables_to_tasks'):
+            self.bind_runnables_to_tasks()
+        with instrumentation.phase('bind_labels_to_runables_and_tasks'):
+            self.bind_labels_to_runables_and_tasks()
+        with instrumentation.phase('bind_tasks_to_cores'):
+            self.bind_tasks_to_cores()
+        if len(self.ecus) > 1:
+            with instrumentation.phase('bind_labels_to_memories'):
+                self.bind_labels_to_memories()
+        with instrumentation.phase('create_memory_tasks'):
+            self.create_memory_tasks()
+        with instrumentation.phase('parse_effect_chains'):
+            self.parse_effect_chains()
         
         if self.letMode:            
-            self.create_LET_tasks()
+            with instrumentation.phase('create_LET_tasks'):
+                self.create_LET_tasks()
 
         
         return copy.copy(self.cpa_sys)
+
+    def signature(self):
+        """ Returns a structural signature of the parsed model, which consists of plain values only
+            (and can therefore be stored alongside analysis results, e.g. as JSON).
+        """
+        runnables = dict()
+        for name, r in self.runnables.items():
+            runnables[name] = {'bcet' : r.bcet, 'wcet' : r.wcet,
+                    'task'  : r.parent_task.name if r.parent_task is not None else None,
+                    'read'  : [l.name for l in r.read_labels],
+                    'write' : [l.name for l in r.write_labels]}
+
+        labels = dict()
+        for name, l in self.cpa_labels.items():
+            labels[name] = {'size' : l.size,
+                    'writer' : l.writeTask.name if l.writeTask is not None else None}
+
+        tasks = dict()
+        for name, t in self.cpa_tasks.items():
+            tasks[name] = {'core' : t.resource.name if t.resource is not None else None,
+                    'prio'   : t.scheduling_parameter,
+                    'period' : t.in_event_model.P,
+                    'runnables' : [r.name for r in t.runnables]}
+
+        chains = dict((e.name, [r.name for r in e.runnables]) for e in self.eventChains)
+
+        cores = dict((name, {'ecu' : ecu, 'time_per_instruction' : self.core_time_per_instruction[name]})
+                for name, ecu in self.core_ecus.items())
+
+        return {'runnables' : runnables, 'labels' : labels, 'tasks' : tasks, 'chains' : chains,
+                'cores' : cores}
+
+    def parameters(self):
+        """ Returns the analysis parameters the model was parsed with (as keyword arguments of
+            waters.analysis.analyze_file()).
+        """
+        return {'scale' : self.scale, 'let_mode' : self.letMode, 'let_task_wcet' : self.letTaskWCET,
+                'read_phases' : self.readPhases}
+
+    def diff(self, baseline):
+        """ Computes the structural diff w.r.t. a baseline model.
+
+        :param baseline: AmaltheaParser of the baseline model or its signature()
+        :returns: waters.diff.ModelDiff
+        """
+        if isinstance(baseline, AmaltheaParser):
+            baseline = baseline.signature()
+        return diff.ModelDiff(baseline, self.signature())
+
+    def create_variant(self):
+        """ Returns a copy-on-write variant of the parsed system (see waters.variants). """
+        return variants.ModelVariant(self.cpa_sys)
     
     def parse_effect_chains(self):
         for effChain in self.constModle.iter('eventChains'):
@@ -87,147 +177,156 @@ class AmaltheaParser(object):
                 e.add_element(self.runnables[response])
             self.eventChains.append(e)
 
-            e.print_chain()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s: %s", e.name, e.describe())
         
     
     def analyzeMemoryOverhead(self, print_results=True, outfile=None, delimiter='\t'):
+        res = waters_results.AnalysisResults()
+        res.add_memory_overhead(self.memory_overhead())
+
         if print_results:
             print("[Task];[Resource];write;read;GRAM")
+            print("\n".join("%s;%s;%d;%d;%d;%d" % tuple(row) for row in res.memory.rows()))
 
-        writer = None
         if outfile is not None:
-            csvfile = open(outfile, 'w+')
-            fieldnames = ['Task', 'Resource', 'Priority', 'write', 'read', 'GRAM']
-            writer = csv.writer(csvfile, delimiter=delimiter)
-            writer.writerow(fieldnames)
-
-        for task_name, task in self.cpa_tasks.items():
-            gramWords = 0
-            sharedWords = 0
-            privateWords = 0
-            for label in task.write_labels:
-                sharedWords += label.size
-            for label in task.read_labels:
-                if label.readOnly == True:
-                    gramWords += label.size
-                else:
-                    privateWords += label.size
+            res.write_csv('memory', outfile, delimiter=delimiter)
 
-            if print_results:
-                print("%s;%s;%d;%d;%d;%d" % (task_name, task.resource, task.scheduling_parameter, sharedWords, privateWords, gramWords))
+    def label_access_table(self):
+        """ Returns the label accesses of all tasks as memory.LabelAccessTable, which provides
+            the memory overhead per task, per core and per priority band. The table is kept until
+            labels or tasks are added (the allocation and priorities of the tasks are looked up
+            on every query).
+        """
+        if self._label_access_table is None:
+            self._label_access_table = memory.LabelAccessTable(self.cpa_tasks)
+        return self._label_access_table
 
-            if writer:
-                writer.writerow([task_name, task.resource, task.scheduling_parameter, sharedWords, privateWords, gramWords])
+    def memory_overhead(self):
+        """ Returns the memory overhead (in words) of each task as a dict keyed by task name. """
+        return self.label_access_table().overhead()
         
-    def analyzeTaskInteractions(self, outfile="task_interactions.dot"):
-        x = len(self.cpa_tasks)+1
-        DataStreams = dict()
-        DataStreams["M1"] = dict()
-        for task_name, task in self.cpa_tasks.items():
-            DataStreams[task_name] = dict()
-            for t_name, t in self.cpa_tasks.items():
-                DataStreams[task_name][t_name] = 0
-            DataStreams[task_name]["M1"] = 0
-            DataStreams["M1"][task_name] = 0
-        for rd_name, rd_task in self.cpa_tasks.items():
+    def task_interactions(self):
+        """ Returns the data volume (in words) read by each task from each writer task (or the memory
+            resource for read-only labels) as a sparse dict keyed by (writer, reader) name pairs.
+        """
+        return self._interactions(lambda task: task.name)
+
+    def core_interactions(self):
+        """ Returns the data volume (in words) exchanged between the cores (or the memory resource for
+            read-only labels) as a sparse dict keyed by (writer, reader) name pairs.
+        """
+        return self._interactions(lambda task: task.resource.name)
+
+    def _interactions(self, node):
+        streams = dict()
+        for rd_task in self.cpa_tasks.values():
             for rd_label in rd_task.read_labels:
                 if rd_label.readOnly == True:
-                    DataStreams["M1"][rd_name] += rd_label.size
+                    key = (rd_label.resource.name, node(rd_task))
                 else:
-                    wr_name = rd_label.writeTask.name
-                    DataStreams[wr_name][rd_name] += rd_label.size
-        
-        with open(outfile, 'w+') as out:
-            print("digraph {", file=out)
-            for wr_stream_name, wr_stream in DataStreams.items():
-                for rd_stream_name, rd_stream in wr_stream.items():
-                    if rd_stream > 0:
-                        thickness = int(ceil((float(rd_stream) / 1000.0) * 5.0))
-                        print ("%s -> %s [label=\"%d\",penwidth=\"%d\"];" % (wr_stream_name, rd_stream_name, rd_stream,
-                            thickness), file=out)
-            print("}", file=out)
-        
+                    key = (node(rd_label.writeTask), node(rd_task))
+                streams[key] = streams.get(key, 0) + rd_label.size
+        return streams
+
+    def analyzeTaskInteractions(self, outfile="task_interactions.dot"):
+        artifacts.write_dot(self.task_interactions(), outfile, scale=1000.0)
         
     def analyzeCoreInteractions(self, outfile="core_interactions.dot"):
-        DataStreams = dict()
-        DataStreams["M1"] = dict()
-        for core_name, core in self.cores.items():
-            DataStreams[core.name] = dict()
-            for c_name, c in self.cores.items():
-                DataStreams[core.name][c.name] = 0
-            DataStreams[core.name]["M1"] = 0
-            DataStreams["M1"][core.name] = 0
-            
-        for rd_name, rd_task in self.cpa_tasks.items():
-            for rd_label in rd_task.read_labels:
-                if rd_label.readOnly == True:
-                    DataStreams["M1"][rd_task.resource.name] += rd_label.size
-                else:
-                    wr_task = rd_label.writeTask
-                    DataStreams[wr_task.resource.name][rd_task.resource.name] += rd_label.size
-        
-        with open(outfile, 'w+') as out:
-            print("digraph {", file=out)
-            for wr_stream_name, wr_stream in DataStreams.items():
-                for rd_stream_name, rd_stream in wr_stream.items():
-                    if rd_stream > 0:
-                        thickness = int(ceil((float(rd_stream) / 2500.0) * 5.0))
-                        print ("%s -> %s [label=\"%d\",penwidth=\"%d\"];" % (wr_stream_name, rd_stream_name, rd_stream,
-                            thickness), file=out)
-            print("}", file=out)    
+        artifacts.write_dot(self.core_interactions(), outfile, scale=2500.0)
 
     def set_time_per_instruction(self):
-        assert ( int(self.hwModel.find('coreTypes').get('instructionsPerCycle')) == 1 )
-        #Supports only models with one microcontroller element!
-        pll_freq = int(float(self.hwModel.find('system/ecus/microcontrollers/quartzes/frequency').get('value')))
-        #Assumption: pll_freq is the CPU clock, i.e. prescaler clockRation=1 for each core)
-        self.time_per_instruction = util.cycles_to_time(value=1,freq=pll_freq, base_time=self.cpa_base)
+        """ Determines the time per instruction of each core (from the quartz of its microcontroller)
+            and the ECU of each core. Returns the time per instruction of the first microcontroller.
+        """
+        for coreType in self.hwModel.iter('coreTypes'):
+            assert ( int(coreType.get('instructionsPerCycle')) == 1 )
+
+        self.time_per_instruction = None
+        self.core_time_per_instruction = dict()
+        self.core_ecus = dict()
+        self.ecu_names = list()
+        for ecu in self.hwModel.iter('ecus'):
+            self.ecu_names.append(ecu.get('name'))
+            for mc in ecu.iter('microcontrollers'):
+                pll_freq = int(float(mc.find('quartzes/frequency').get('value')))
+                #Assumption: pll_freq is the CPU clock, i.e. prescaler clockRation=1 for each core)
+                time_per_instruction = util.cycles_to_time(value=1,freq=pll_freq, base_time=self.cpa_base)
+                if self.time_per_instruction is None:
+                    self.time_per_instruction = time_per_instruction
+                for core in mc.iter('cores'):
+                    self.core_time_per_instruction[core.get('name')] = time_per_instruction
+                    self.core_ecus[core.get('name')] = ecu.get('name')
+
         return self.time_per_instruction
     
     def add_resources(self):
-        print("Add memory Resource M1")
-        memoryScheduler = schedulers.FIFOSchedulerFair(num_cores=4)
-        self.memoryResource = waters_model.MemoryResource("M1", read_access_times=(8,8), write_access_times=(8,8), scheduler=memoryScheduler)
-        self.cpa_sys.bind_resource(self.memoryResource) 
+        # each ECU has a memory resource, which is shared by its cores
+        for ecu_name in self.ecu_names:
+            num_cores = len([c for c, e in self.core_ecus.items() if e == ecu_name])
+            m_name = "M1" if len(self.ecu_names) == 1 else "%s_M1" % ecu_name
+            logger.info("Add memory Resource %s (%d cores)", m_name, num_cores)
+            memoryScheduler = schedulers.FIFOSchedulerFair(num_cores=num_cores)
+            memoryResource = waters_model.MemoryResource(m_name, read_access_times=(8,8), write_access_times=(8,8), scheduler=memoryScheduler)
+            self.cpa_sys.bind_resource(memoryResource) 
+            self.ecus[ecu_name] = waters_model.ECU(ecu_name, memoryResource)
+            if self.memoryResource is None:
+                self.memoryResource = memoryResource
         
         for core_alloc in self.mappingModel.iter('coreAllocation'):
             r_name = self.clean_xml_string(core_alloc.get('core'))
             sched_name = core_alloc.get('scheduler')
-            print("Add Core %s with scheduler-name %s" %(r_name, sched_name))
+            logger.info("Add Core %s with scheduler-name %s", r_name, sched_name)
             if self.letMode:
                 #TODO: Fix me
                 core = model.Resource(r_name, schedulers.SPPSchedulerWithCritSection())
             else:
                 core = model.Resource(r_name, schedulers.SPPSchedulerWithCritSection())
             self.cores[sched_name] = core
+            self.ecus[self.core_ecus[r_name]].cores[sched_name] = core
             self.cpa_sys.bind_resource(core)    
+
+    def ecu_of(self, core):
+        """ Returns the ECU of the given (parsed) core. """
+        for ecu in self.ecus.values():
+            if core in ecu.cores.values():
+                return ecu
+        return None
             
     def add_labels(self):
+        self._label_access_table = None
         for label in self.swm.iter('labels'):
             size = int(ceil(float(label.find('size').get('value'))/32.0))
             name = label.get('name')
             label = waters_model.Label(name, size);
             label.bind_resource(self.memoryResource)
             self.cpa_labels[name] = label
-        print("Added %d labels" % (len(self.cpa_labels)))
+        logger.info("Added %d labels", len(self.cpa_labels))
 
     def add_tasks(self):
+        self._label_access_table = None
         for t in self.swm.iter('tasks'):
             task_name = t.get('name')
             self.cpa_tasks[task_name] = waters_model.RunnableTask(name = task_name , letMode = self.letMode, scheduling_parameter = int(t.get('priority')))
             self.cpa_tasks[task_name].in_event_model = self.construct_event_model(t)
             #print("Task %s EventModel: %s" % (task_name,self.cpa_tasks[task_name].in_event_model))
-        print("Added %d tasks" % (len(self.cpa_tasks)))
+        logger.info("Added %d tasks", len(self.cpa_tasks))
 
     def add_runnables(self):
+        runnable_clocks = dict()
+        if len(set(self.core_time_per_instruction.values())) > 1:
+            runnable_clocks = self._runnable_time_per_instruction()
+
         for run in self.swm.iter('runnables'):
             name = run.get('name')
-            bcet = int(float(run.find('runnableItems/default/deviation/lowerBound').get('value')) * float(self.time_per_instruction) * self.scale)
-            wcet = int(float(run.find('runnableItems/default/deviation/upperBound').get('value')) * float(self.time_per_instruction) * self.scale)
+            time_per_instruction = float(runnable_clocks.get(name, self.time_per_instruction))
+            bcet = int(float(run.find('runnableItems/default/deviation/lowerBound').get('value')) * time_per_instruction * self.scale)
+            wcet = int(float(run.find('runnableItems/default/deviation/upperBound').get('value')) * time_per_instruction * self.scale)
             self.runnables[name] = waters_model.Runnable(name, bcet=bcet, wcet=wcet)
-        print("Added %d runnables" % (len(self.runnables)))
+        logger.info("Added %d runnables", len(self.runnables))
         
     def bind_labels_to_runables_and_tasks(self):
+        self._label_access_table = None
         for runnable_node in self.swm.iter('runnables'):
             runnable = self.runnables[runnable_node.get('name')]
             cpa_task = runnable.parent_task
@@ -237,13 +336,31 @@ class AmaltheaParser(object):
                     cpa_label = self.cpa_labels[self.clean_xml_string( attrib['data'] )]
                     if attrib['access'] == "read":
                         cpa_task.bind_read_label(cpa_label)
+                        runnable.bind_read_label(cpa_label)
                     elif attrib['access'] == "write":
                         cpa_task.bind_write_label(cpa_label)
+                        runnable.bind_write_label(cpa_label)
                         cpa_label.readOnly = False
                         cpa_label.writeTask = cpa_task
                     else:
                         raise ValueError
         
+    def _runnable_time_per_instruction(self):
+        """ Returns the time per instruction of the core executing each runnable (keyed by runnable name). """
+        sched_cores = dict((core_alloc.get('scheduler'), self.clean_xml_string(core_alloc.get('core')))
+                for core_alloc in self.mappingModel.iter('coreAllocation'))
+        task_cores = dict((self.clean_xml_string(task_alloc.get('task')), sched_cores[task_alloc.get('scheduler')])
+                for task_alloc in self.mappingModel.iter('taskAllocation'))
+
+        clocks = dict()
+        for t in self.swm.iter('tasks'):
+            core = task_cores.get(t.get('name'))
+            if core is None:
+                continue
+            for call in t.find('callGraph').find('graphEntries').iter('calls'):
+                clocks[self.clean_xml_string(call.get('runnable'))] = self.core_time_per_instruction[core]
+        return clocks
+
     def bind_runnables_to_tasks(self):
         for t in self.swm.iter('tasks'):
             task = self.cpa_tasks[t.get('name')]
@@ -258,27 +375,113 @@ class AmaltheaParser(object):
             r.bind_task(task)
         return None
                     
+    def bind_labels_to_memories(self):
+        """ Binds each label to the memory resource of the ECU of its writer (or first reader).
+
+            The memory tasks only read the labels from the memory of their own ECU, i.e. the
+            communication between ECUs is not part of the analysis.
+        """
+        readers = dict()
+        for task in self.cpa_tasks.values():
+            for label in task.read_labels:
+                readers.setdefault(label.name, task)
+
+        remote = 0
+        for name, label in self.cpa_labels.items():
+            task = label.writeTask if label.writeTask is not None else readers.get(name)
+            if task is None or task.resource is None:
+                continue
+            label.bind_resource(self.ecu_of(task.resource).memory)
+
+        for task in self.cpa_tasks.values():
+            if task.resource is not None:
+                memoryResource = self.ecu_of(task.resource).memory
+                remote += len([l for l in task.read_labels if l.resource is not memoryResource])
+        if remote > 0:
+            logger.warning("%d label reads across ECUs are not analysed", remote)
+
     def create_memory_tasks(self):
-        for core_name, core in self.cores.items():
-            for task in core.tasks:
-                task.create_and_bind_input_task(self.memoryResource)
+        for ecu in self.ecus.values():
+            for core_name, core in ecu.cores.items():
+                for task in core.tasks:
+                    if self.readPhases is None:
+                        task.create_and_bind_input_task(ecu.memory)
+                    else:
+                        task.create_and_bind_input_tasks(ecu.memory, self.read_label_groups(task))
+
+    def read_label_groups(self, task):
+        """ Returns the read labels of the given task grouped into read phases (see readPhases). """
+        if self.readPhases == 'runnable':
+            return [r.read_labels for r in task.runnables]
+
+        size = int(self.readPhases)
+        return [task.read_labels[i:i+size] for i in range(0, len(task.read_labels), size)]
                     
                     
-    def create_LET_tasks(self):
-        for core_name, core in self.cores.items():
+    def create_LET_tasks(self, cores=None, memories=None, resolve_task=None, wcets=None, slots=None, let_tasks=None):
+        """ Adds the LET tasks to the given cores (default: the parsed cores).
+
+            The optional arguments allow adding LET tasks to a ModelVariant, in which case
+            memories maps the core (scheduler) names to the variant's memory resources and
+            resolve_task maps the (shared) label writers to the variant's tasks.
+
+            By default, every task of a core gets a LET task with WCET letTaskWCET and the
+            LET tasks of a core are released in consecutive slots at the end of the period.
+            The remaining arguments override these parameters:
+
+            :param wcets: WCET of the LET tasks keyed by core name
+            :param slots: number of slots at the end of the period keyed by core name
+                (must be at least the number of LET tasks of the core)
+            :param let_tasks: names of the tasks that use LET communication (others communicate implicitly)
+        """
+        if cores is None:
+            cores = self.cores
+        if memories is None:
+            memories = dict((sched_name, ecu.memory) for ecu in self.ecus.values() for sched_name in ecu.cores)
+        if wcets is None:
+            wcets = dict()
+        if slots is None:
+            slots = dict()
+
+        for core_name, core in cores.items():
+            memoryResource = memories[core_name]
             letTasks = list()
-            numberOfTasks = len(core.tasks)
-            for task in core.tasks:
-                offset = task.in_event_model.P - (numberOfTasks * self.letTaskWCET)
+            tasks = [t for t in core.tasks if let_tasks is None or t.name in let_tasks]
+            wcet = wcets.get(core_name, self.letTaskWCET)
+            numberOfTasks = slots.get(core_name, len(tasks))
+            assert numberOfTasks >= len(tasks)
+            for task in tasks:
+                offset = task.in_event_model.P - (numberOfTasks * wcet)
                 letLabel = waters_model.Label(task.name + ':LET_Label')
-                letLabel.bind_resource(self.memoryResource)
-                letTasks.append(waters_model.LETTask(parent_task = task, wcet = self.letTaskWCET, offset = offset, letLabel = letLabel))
+                letLabel.bind_resource(memoryResource)
+                letTasks.append(waters_model.LETTask(parent_task = task, wcet = wcet, offset = offset, letLabel = letLabel))
             for letTask in letTasks:
                 core.bind_task(letTask)
-        for core_name, core in self.cores.items():
+        for core_name, core in cores.items():
             for task in core.tasks:
                 if not isinstance(task, waters_model.LETTask):
-                    task.update_let_overhead()
+                    task.update_let_overhead(resolve_task)
+
+    def create_LET_variant(self, wcets=None, slots=None, let_tasks=None):
+        """ Returns a ModelVariant of the parsed (implicit communication) system with LET tasks
+            (see create_LET_tasks() for the optional arguments).
+        """
+        assert not self.letMode
+
+        variant = self.create_variant()
+        cores = dict()
+        memories = dict()
+        for ecu in self.ecus.values():
+            memoryResource = variant.writable_resource(ecu.memory)
+            for core_name, core in ecu.cores.items():
+                cores[core_name] = variant.writable_resource(core)
+                memories[core_name] = memoryResource
+                for task in cores[core_name].tasks:
+                    task.letMode = let_tasks is None or task.name in let_tasks
+
+        self.create_LET_tasks(cores, memories, resolve_task=variant.task, wcets=wcets, slots=slots,
+                let_tasks=let_tasks)
+        return variant
     
     def construct_event_model(self, task_node):
         stimulus_name = self.clean_xml_string(task_node.get('stimuli'))
@@ -297,7 +500,7 @@ class AmaltheaParser(object):
         elif stimulus.get(xsi+'type') == "am:Sporadic":
             s_param = stimulus.find('stimulusDeviation').find('lowerBound').attrib
             P = util.time_to_time( int(s_param['value']) , base_in=util.str_to_time_base(s_param['unit']), base_out=self.cpa_base)
-            return model.PJdEventModel(P=P, J=0)
+            return waters_model.SporadicEventModel(P=P, J=0)
         else:
             raise ValueError
             
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+Slim, analysis-only entry point for short (scripted) analysis jobs::
+
+    python -m waters --model examples/Challenge.xml --output results.json
+
+It parses and analyses a single model and writes the WCRT, memory overhead and latency results
+as JSON (see waters.analysis.analyze_file()). Modules are only imported if the requested
+outputs require them, and --import_times reports the time spent on importing them.
+The full set of outputs is provided by examples/challenge.py.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import sys
+import time
+import importlib
+
+_import_times = list()
+
+def _import(name):
+    """ Imports the given module and records the (cumulative) import time. """
+    start = time.time()
+    module = importlib.import_module(name)
+    _import_times.append((name, time.time() - start))
+    return module
+
+def _report_import_times(out=sys.stderr):
+    print("Import times:", file=out)
+    for name, duration in _import_times:
+        print("  %-24s %8.2f ms" % (name, duration * 1000), file=out)
+    print("  %-24s %8.2f ms" % ('total', sum(d for n, d in _import_times) * 1000), file=out)
+
+def main():
+    options = _import('pycpa.options')
+    log = _import('waters.log')
+
+    options.parser.add_argument('--model', type=str, required=True,
+            help="Almathea model.")
+    options.parser.add_argument('--output', type=str, default=None,
+            help="Writes the results as JSON to given file (default: stdout).")
+    options.parser.add_argument('--let_mode', action='store_true',
+            help="Use LET communication.")
+    options.parser.add_argument('--scale', type=float, default=0.7,
+            help="Scales execution times (?) in the given model (to render the system schedulable).")
+    options.parser.add_argument('--let_task_wcet', type=int, default=50,
+            help="Constant execution time for LET Tasks")
+    options.parser.add_argument('--read_phases', type=str, default='task',
+            help="Memory read phases of a task: task (a single phase), runnable (one phase per runnable) "
+                 "or the number of labels per phase.")
+    options.parser.add_argument('--signature', action='store_true',
+            help="Include the model signature (required as baseline for re-analyses).")
+    options.parser.add_argument('--workers', type=int, default=1,
+            help="Number of worker processes for analysing multiple ECUs in parallel (0: number of CPUs).")
+    options.parser.add_argument('--cache_dir', type=str, default=None,
+            help="Directory of the persistent result cache.")
+    options.parser.add_argument('--import_times', action='store_true',
+            help="Report the time spent on importing modules to stderr.")
+    log.add_options(options.parser)
+
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+
+    cache = None
+    if options.get_opt('cache_dir') is not None:
+        cache = _import('waters.cache').ResultCache(options.get_opt('cache_dir'))
+
+    waters_analysis = _import('waters.analysis')
+    atp = _import('waters.AmaltheaParser')
+    results = waters_analysis.analyze_file(options.get_opt('model'),
+            scale=options.get_opt('scale'),
+            let_mode=options.get_opt('let_mode'),
+            let_task_wcet=options.get_opt('let_task_wcet'),
+            signature=options.get_opt('signature'),
+            cache=cache,
+            workers=options.get_opt('workers') or None,
+            read_phases=atp.read_phases_arg(options.get_opt('read_phases')))
+
+    json = _import('json')
+    if options.get_opt('output') is None:
+        json.dump(results, sys.stdout, indent=1, sort_keys=True)
+        print()
+    else:
+        with open(options.get_opt('output'), 'w') as outfile:
+            json.dump(results, outfile, indent=1, sort_keys=True)
+
+    if options.get_opt('import_times'):
+        _report_import_times()
+
+if __name__ == "__main__":
+    main()
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
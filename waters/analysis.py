@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+         - Kai-Björn Gemlau
+
+Description
+-----------
+
+This script implements the analysis procedure for parsed WATERS models, i.e. the
+two-pass response time analysis and the latency analysis of the cause-effect chains.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import logging
+
+from pycpa import analysis
+from pycpa import model
+from . import model as waters_model
+from . import schedulers
+from . import path_analysis
+from . import instrumentation
+from . import AmaltheaParser as atp
+from . import results as waters_results
+
+logger = logging.getLogger(__name__)
+
+def analyze_system(system):
+    """ Performs the response time analysis of the given system and returns the task results.
+
+    The WCRTs of the memory tasks are independent from any event models and from the
+    processing resources. Hence, if all memory resources use the FIFOSchedulerFair, we
+    first compute the results of all memory tasks in closed form, then update the
+    execution times of the runnable tasks and perform a single analysis run of the
+    processing resources.
+
+    Otherwise, we perform two runs of the analysis:
+    The first run is for getting the response times of the memory task which are
+    then used to update the execution times of the runnable tasks.
+    The second run then results in the correct response times of the runnable tasks.
+    """
+    memories = [r for r in system.resources if isinstance(r, waters_model.MemoryResource)]
+    if not all(isinstance(r.scheduler, schedulers.FIFOSchedulerFair) for r in memories):
+        return _analyze_system_two_pass(system)
+
+    task_results = dict()
+    for r in system.resources:
+        for t in r.tasks:
+            task_results[t] = analysis.TaskResult()
+
+    logger.info("Performing memory analysis")
+    with instrumentation.phase('memory_analysis'):
+        for r in sorted(memories, key=str):
+            r.scheduler.analyze_tasks(sorted(r.tasks, key=str), task_results)
+    update_execution_times(system, task_results)
+
+    logger.info("Performing analysis of the processing resources")
+    cores = model.System()
+    for r in system.resources:
+        if r not in memories:
+            cores.bind_resource(r)
+    with instrumentation.phase('core_analysis'):
+        analysis.analyze_system(cores, task_results, progress_hook=None)
+
+    # attach the execution time split (read/exec/write) to the final results
+    update_execution_times(system, task_results)
+
+    return task_results
+
+def _analyze_system_two_pass(system):
+    logger.info("Performing analysis")
+    with instrumentation.phase('analysis_pass1'):
+        task_results = analysis.analyze_system(system, progress_hook=None)
+    logger.info("Update Execution Times")
+    update_execution_times(system, task_results)
+
+    logger.info("Second analysis run")
+    with instrumentation.phase('analysis_pass2'):
+        task_results = analysis.analyze_system(system, progress_hook=None)
+
+    # attach the execution time split (read/exec/write) to the final results
+    update_execution_times(system, task_results)
+
+    return task_results
+
+def partition_system(system):
+    """ Splits the system into independent subsystems, i.e. groups of resources whose tasks do
+        not reference tasks on other groups (e.g. the cores and the memory of an ECU).
+
+    :returns: list of systems (the system itself if it cannot be split)
+    """
+    group = dict((r, r) for r in system.resources)
+
+    def find(r):
+        while group[r] is not r:
+            group[r] = group[group[r]]
+            r = group[r]
+        return r
+
+    for r in system.resources:
+        for t in r.tasks:
+            for other in _referenced_resources(t):
+                if other in group:
+                    group[find(other)] = find(r)
+
+    partitions = dict()
+    for r in system.resources:
+        partitions.setdefault(find(r), list()).append(r)
+
+    if len(partitions) < 2:
+        return [system]
+
+    subsystems = list()
+    for resources in sorted(partitions.values(), key=lambda p: min(r.name for r in p)):
+        s = model.System()
+        for r in sorted(resources, key=str):
+            s.bind_resource(r)
+        subsystems.append(s)
+    return subsystems
+
+def _referenced_resources(task):
+    tasks = [getattr(task, 'parent_task', None), getattr(task, 'parentTask', None),
+             getattr(task, 'LETTask', None)] + list(getattr(task, 'memory_input_tasks', []))
+    return [t.resource for t in tasks if t is not None and t.resource is not None]
+
+def analyze_systems(systems, workers=1):
+    """ Analyses multiple independent systems (e.g. ModelVariants) with analyze_system().
+
+    Each system is split into its independent subsystems (see partition_system()), e.g. one
+    per ECU, which are analysed separately. With workers != 1, the subsystems are analysed in
+    parallel by forked worker processes (if supported by the platform), which inherit the
+    systems from the parent process and only send back the task results.
+
+    :param workers: number of worker processes (None: number of CPUs)
+    :returns: list of task results (one dict per system)
+    """
+    partitions = [partition_system(s) for s in systems]
+    subsystem_results = _analyze_subsystems([p for parts in partitions for p in parts], workers)
+
+    all_results = list()
+    for parts in partitions:
+        task_results = dict()
+        for results in subsystem_results[:len(parts)]:
+            task_results.update(results)
+        subsystem_results = subsystem_results[len(parts):]
+        all_results.append(task_results)
+
+    return all_results
+
+def _analyze_subsystems(systems, workers):
+    if workers == 1 or len(systems) < 2:
+        return [analyze_system(s) for s in systems]
+
+    # only imported if required, as it adds to the startup time of short (serial) runs
+    import multiprocessing
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return [analyze_system(s) for s in systems]
+
+    global _forked_systems
+    _forked_systems = systems
+    try:
+        pool = multiprocessing.get_context('fork').Pool(processes=workers)
+        try:
+            values = pool.map(_analyze_forked_system, range(len(systems)))
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        _forked_systems = None
+
+    all_results = list()
+    for s, task_values in zip(systems, values):
+        task_results = dict()
+        for r in s.resources:
+            for t in r.tasks:
+                if t.name in task_values:
+                    tr = analysis.TaskResult()
+                    for key, value in task_values[t.name].items():
+                        setattr(tr, key, value)
+                    task_results[t] = tr
+        update_execution_times(s, task_results)
+        all_results.append(task_results)
+
+    return all_results
+
+_forked_systems = None
+
+def _analyze_forked_system(index):
+    """ Worker function of analyze_systems(): returns the task results as plain values keyed by task name. """
+    s = _forked_systems[index]
+    task_results = analyze_system(s)
+    return dict((t.name, {'wcrt' : tr.wcrt, 'bcrt' : tr.bcrt,
+                          'q_wcrt' : getattr(tr, 'q_wcrt', None), 'busy_times' : getattr(tr, 'busy_times', None)})
+                for t, tr in task_results.items())
+
+def update_execution_times(system, task_results):
+    """ Updates the execution times of all runnable tasks from the memory task WCRTs. """
+    for r in sorted(system.resources, key=str):
+        for t in sorted(r.tasks, key=str):
+            if isinstance(t, waters_model.RunnableTask):
+                t.update_execution_time(task_results = task_results)
+
+def analyze_tasks(tasks, task_results):
+    """ Performs the local analysis of the given tasks only, using (and updating) the given task results.
+        As the waters models do not contain event model propagation, this is equivalent to
+        analysing the tasks within analysis.analyze_system().
+    """
+    for t in tasks:
+        task_results[t] = analysis.TaskResult()
+    for t in tasks:
+        analysis.analyze_task(t, task_results)
+
+def chain_latencies(chains, task_results):
+    """ Computes data age and reaction time of the given chains.
+
+    :returns: list of (chain, data age, reaction time, data age details, reaction time details)
+    """
+    latencies = list()
+    with instrumentation.phase('chain_latencies'):
+        _chain_latencies(chains, task_results, latencies)
+
+    return latencies
+
+def _chain_latencies(chains, task_results, latencies):
+    index = path_analysis.ChainIndex(chains)
+    index.update(task_results)
+    latencies.extend(index.latencies())
+
+def cache_key(cache, filename, scale=1.0, let_mode=False, let_task_wcet=50, signature=False, read_phases=None):
+    """ Returns the key of the results of analyze_file() with the given parameters in the given
+        waters.cache.ResultCache (for looking up the results without calling analyze_file()).
+    """
+    return cache.key(filename, scale=scale, let_mode=let_mode, let_task_wcet=let_task_wcet,
+            signature=signature, read_phases=read_phases)
+
+def analyze_file(filename, scale=1.0, let_mode=False, let_task_wcet=50, signature=False, cache=None, workers=1,
+        read_phases=None):
+    """ Parses and analyses the given AMALTHEA model.
+
+    :param signature: include the model signature and the analysis parameters
+        (required as baseline for reanalyze_file())
+    :param cache: waters.cache.ResultCache to look up and store the results
+    :param workers: number of worker processes for analysing the ECUs in parallel (see analyze_systems())
+    :param read_phases: granularity of the memory read phases (see AmaltheaParser)
+    :returns: dict with WCRT, memory overhead and latency results (plain values keyed by name)
+    """
+    if cache is not None:
+        key = cache_key(cache, filename, scale=scale, let_mode=let_mode, let_task_wcet=let_task_wcet,
+                signature=signature, read_phases=read_phases)
+        results = cache.get(key)
+        if results is not None:
+            return results
+
+    amt_parser = atp.AmaltheaParser(filename, scale = scale, letMode = let_mode,
+                                    letTaskWCET = let_task_wcet, readPhases = read_phases)
+    s = amt_parser.parse_amalthea()
+
+    task_results = analyze_systems([s], workers)[0]
+    latencies = chain_latencies(amt_parser.eventChains, task_results)
+
+    results = waters_results.build(s, task_results, latencies, amt_parser.memory_overhead(), loads=False).to_dict()
+    if signature:
+        results['signature'] = amt_parser.signature()
+        results['parameters'] = amt_parser.parameters()
+
+    if cache is not None:
+        cache.put(key, results)
+
+    return results
+
+def reanalyze_file(filename, baseline, scale=1.0, let_mode=False, let_task_wcet=50, read_phases=None):
+    """ Parses the given AMALTHEA model and only re-analyses the parts that changed
+        w.r.t. the baseline. The analysis parameters must match those of the baseline.
+
+    :param baseline: results of the baseline model as returned by analyze_file(..., signature=True)
+    :returns: (results, delta report), see analyze_delta()
+    """
+    amt_parser = atp.AmaltheaParser(filename, scale = scale, letMode = let_mode,
+                                    letTaskWCET = let_task_wcet, readPhases = read_phases)
+    amt_parser.parse_amalthea()
+
+    return analyze_delta(amt_parser, baseline)
+
+def analyze_delta(amt_parser, baseline):
+    """ Re-analyses the affected resources and chains of a parsed model w.r.t. the baseline results.
+
+    Unaffected tasks (and their memory tasks) take over the baseline results. The memory tasks
+    of affected tasks and all tasks on the cores hosting affected tasks are analysed again.
+    Only chains that were modified or contain a task whose results changed are recomputed
+    (see path_analysis.ChainIndex).
+
+    :param amt_parser: AmaltheaParser of the new model (already parsed)
+    :param baseline: results of the baseline model as returned by analyze_file(..., signature=True)
+    :returns: (results, delta report); the results contain the new signature and can serve as next baseline
+    :raises ValueError: if the model was parsed with other analysis parameters than the baseline
+    """
+    parameters = amt_parser.parameters()
+    if baseline.get('parameters') != parameters:
+        raise ValueError("baseline was analysed with parameters %s instead of %s" %
+                (baseline.get('parameters'), parameters))
+
+    model_diff = amt_parser.diff(baseline['signature'])
+    affected_names = model_diff.affected_tasks()
+
+    affected = set()
+    task_results = dict()
+    for name, t in amt_parser.cpa_tasks.items():
+        if name in affected_names or name not in baseline['wcrt']:
+            affected.add(t)
+        else:
+            _restore_task_result(t, baseline['wcrt'][name], task_results)
+
+    # analyse all tasks of the cores that host affected tasks (or hosted them in the baseline)
+    cores = set(t.resource for t in affected)
+    cores.update(r for r in amt_parser.cores.values() if r.name in model_diff.affected_resources())
+
+    # LET tasks on the other cores take over their baseline results (if available)
+    for r in amt_parser.cores.values():
+        for t in r.tasks:
+            if isinstance(t, waters_model.LETTask) and r not in cores:
+                if t.name in baseline.get('let', {}):
+                    tr = analysis.TaskResult()
+                    tr.wcrt = baseline['let'][t.name]['WCRT']
+                    tr.bcrt = baseline['let'][t.name]['BCRT']
+                    task_results[t] = tr
+                else:
+                    cores.add(r)
+
+    # analyse the memory tasks of the affected tasks and the read phases of the tasks on these
+    # cores (the baseline only contains the total read time of a task)
+    memory_tasks = [m for t in amt_parser.cpa_tasks.values()
+            if t in affected or (t.resource in cores and len(t.memory_input_tasks) > 1)
+            for m in t.memory_input_tasks if m.resource is not None]
+    analyze_tasks(memory_tasks, task_results)
+
+    for r in cores:
+        for t in r.tasks:
+            if isinstance(t, waters_model.RunnableTask):
+                task_results.setdefault(t, analysis.TaskResult())
+                t.update_execution_time(task_results = task_results)
+    for r in sorted(cores, key=str):
+        analyze_tasks(sorted(r.tasks, key=str), task_results)
+    for r in cores:
+        for t in r.tasks:
+            if isinstance(t, waters_model.RunnableTask):
+                t.update_execution_time(task_results = task_results)
+
+    # recompute the modified chains and the chains that contain a task whose results changed
+    changed = set(affected)
+    for r in cores:
+        for t in r.tasks:
+            if not isinstance(t, waters_model.RunnableTask) or \
+                    _results_changed(t, task_results[t], baseline['wcrt'].get(t.name)):
+                changed.add(t)
+    chains = path_analysis.ChainIndex(amt_parser.eventChains).chains_of(changed)
+    chains += [e for e in amt_parser.eventChains if e not in chains and
+            (e.name in model_diff.chains or e.name not in baseline['latency'])]
+
+    # tasks on unaffected cores take over their baseline results (restored above)
+    res = waters_results.build(amt_parser.cpa_sys, task_results, chain_latencies(chains, task_results),
+            amt_parser.memory_overhead(), loads=False)
+    recomputed = set(res.chains.column('Name'))
+    for name, value in sorted(baseline['latency'].items()):
+        if name in model_diff.new['chains'] and name not in recomputed:
+            res.chains.append([name, value['Data Age'], value['Reaction Time'], True])
+
+    results = res.to_dict()
+    results['signature'] = model_diff.new
+    results['parameters'] = parameters
+
+    report = {'diff'      : model_diff.summary(),
+              'resources' : sorted(r.name for r in cores),
+              'tasks'     : sorted(t.name for t in affected),
+              'chains'    : sorted(e.name for e in chains),
+              'wcrt'      : _delta(baseline['wcrt'], results['wcrt'], 'WCRT'),
+              'latency'   : dict((key, _delta(baseline['latency'], results['latency'], key))
+                                 for key in ('Data Age', 'Reaction Time'))}
+
+    return results, report
+
+def _restore_task_result(task, row, task_results):
+    """ Creates the task results of a runnable task and its memory task from a baseline result row
+        and restores the execution times of the task (including the memory accesses).
+    """
+    task.wcet = row['WCET']
+    task.bcet = row['BCET']
+
+    tr = analysis.TaskResult()
+    tr.wcrt = row['WCRT']
+    tr.bcrt = row['BCRT']
+    for key in ('readWCET', 'execWCET', 'writeWCET', 'readBCET', 'execBCET', 'writeBCET'):
+        setattr(tr, key, row[key])
+    task_results[task] = tr
+
+    if len(task.memory_input_tasks) == 1:
+        mtr = analysis.TaskResult()
+        mtr.wcrt = row['readWCET']
+        mtr.bcrt = row['readBCET']
+        task_results[task.memory_input_task] = mtr
+
+def _results_changed(task, tr, row):
+    """ Returns true if the results of the given task differ from the baseline result row. """
+    return row is None or row['WCRT'] != tr.wcrt or row['BCRT'] != tr.bcrt or row['PERIOD'] != task.in_event_model.P
+
+def _delta(old, new, key):
+    """ Returns the (old, new) values of all entries whose value changed, was added or removed. """
+    delta = dict()
+    for name in set(old.keys()).union(new.keys()):
+        old_value = old[name][key] if name in old else None
+        new_value = new[name][key] if name in new else None
+        if old_value != new_value:
+            delta[name] = (old_value, new_value)
+    return delta
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
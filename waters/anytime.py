@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements an anytime analysis, which first computes safe upper bounds of the
+response times of all tasks from the utilization of their cores and then refines these bounds
+core by core with the exact analysis (most loaded or most critical core first) until a
+deadline expires.
+
+The memory tasks are analysed exactly from the start (in closed form). For a task with WCET C,
+blocking B and the set hp of interfering (higher or equal priority) tasks with periods P_j,
+jitters J_j and utilizations U_j = C_j/P_j, the request bound function of the busy window is
+bounded by the linear function qC + B + sum_j C_j ((w + J_j)/P_j + 1) (cf. [Bini2009]_).
+If sum_j U_j + C/P <= 1, the response time is maximal for q = 1, hence
+WCRT <= (C + B + sum_j (C_j + U_j J_j)) / (1 - sum_j U_j) + J.
+Otherwise, the busy window is unbounded and the system is not schedulable.
+The tasks of cores with aperiodic event models get max_wcrt as placeholder bound (the exact
+analysis fails for larger response times); these cores are refined first.
+
+Chain latencies computed from these bounds are upper bounds as well, as the path analysis
+handles unrefined results pessimistically (see path_analysis._calculate_distanceBW()).
+
+.. [Bini2009] E. Bini, T. H. C. Nguyen, P. Richard, S. K. Baruah: A Response-Time Bound in
+   Fixed-Priority Scheduling with Arbitrary Deadlines. IEEE Transactions on Computers, 2009.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import math
+import time
+import logging
+
+from pycpa import analysis
+from pycpa import options
+
+from . import model as waters_model
+from . import analysis as waters_analysis
+from . import path_analysis
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+ORDERS = ['load', 'chains']
+
+class AnytimeAnalysis(object):
+    """ Anytime analysis of the given system and chains.
+
+        The task results carry the attribute refined, which is False for bounds
+        and True for results of the exact analysis.
+
+        :param order: order of the refinement: 'load' (most loaded core first) or
+            'chains' (core with the largest chain latency first)
+    """
+
+    def __init__(self, system, chains, order='load'):
+        assert order in ORDERS
+        self.system = system
+        self.order = order
+        self.task_results = dict()
+        self.index = path_analysis.ChainIndex(chains)
+
+        self.memories = sorted([r for r in system.resources if isinstance(r, waters_model.MemoryResource)], key=str)
+        self.cores = sorted([r for r in system.resources if r not in self.memories], key=str)
+        self.refined = set()
+
+    def bounds(self):
+        """ Computes the (exact) results of the memory tasks, the response time bounds of all
+            other tasks and the chain latencies from these bounds.
+        """
+        with instrumentation.phase('anytime_bounds'):
+            for r in self.system.resources:
+                for t in r.tasks:
+                    self.task_results[t] = analysis.TaskResult()
+
+            for r in self.memories:
+                if hasattr(r.scheduler, 'analyze_tasks'):
+                    r.scheduler.analyze_tasks(sorted(r.tasks, key=str), self.task_results)
+                else:
+                    waters_analysis.analyze_tasks(sorted(r.tasks, key=str), self.task_results)
+            waters_analysis.update_execution_times(self.system, self.task_results)
+
+            for r in self.cores:
+                if all(_rate(t.in_event_model) is not None for t in r.tasks):
+                    bound = self.wcrt_bound
+                else:
+                    # no bound from the utilization for these event models
+                    placeholder = self.placeholder_bound(r)
+                    bound = lambda t: placeholder
+                for t in r.tasks:
+                    tr = self.task_results[t]
+                    tr.wcrt = bound(t)
+                    tr.bcrt = r.scheduler.compute_bcrt(t, self.task_results)
+                    tr.refined = False
+
+            self.index.update(self.task_results)
+
+        logger.info("bounds computed, %d of %d cores refined", len(self.refined), len(self.cores))
+        return self.task_results
+
+    def wcrt_bound(self, task):
+        """ Returns the WCRT bound of the given task (see module description). """
+        scheduler = task.resource.scheduler
+        P, J = _rate(task.in_event_model)
+
+        U = 0
+        demand = task.wcet + scheduler.get_largestCriticalSection(task, self.task_results)
+        for ti in task.get_resource_interferers():
+            if scheduler.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter):
+                P_j, J_j = _rate(ti.in_event_model)
+                U += ti.wcet / P_j
+                demand += ti.wcet + ti.wcet * J_j / P_j
+
+        if U + task.wcet / P > 1:
+            raise analysis.NotSchedulableException("%s: utilization exceeds 1" % task.name)
+
+        return int(math.ceil(demand / (1 - U))) + J
+
+    def placeholder_bound(self, resource):
+        """ Returns the WCRT bound of the tasks of a core without utilization bound: max_wcrt, as
+            the exact analysis fails for larger response times.
+        """
+        max_wcrt = options.get_opt('max_wcrt')
+        if max_wcrt is None or math.isinf(max_wcrt):
+            raise ValueError("%s: tasks without period require a finite max_wcrt as response time bound"
+                    % resource.name)
+        return int(max_wcrt)
+
+    def utilization(self, resource):
+        """ Returns the utilization of the given core (infinite if a task has no period). """
+        if any(_rate(t.in_event_model) is None for t in resource.tasks):
+            return float('inf')
+        return sum(t.wcet / _rate(t.in_event_model)[0] for t in resource.tasks)
+
+    def refine_core(self, resource):
+        """ Replaces the bounds of the tasks of the given core by the exact results. """
+        tasks = sorted(resource.tasks, key=str)
+        waters_analysis.analyze_tasks(tasks, self.task_results)
+        for t in tasks:
+            if isinstance(t, waters_model.RunnableTask):
+                t.update_execution_time(task_results = self.task_results)
+            self.task_results[t].refined = True
+        self.refined.add(resource)
+        self.index.update(self.task_results, tasks)
+
+    def pending(self):
+        """ Returns the unrefined cores in the order of their refinement. """
+        cores = [r for r in self.cores if r not in self.refined]
+        if self.order == 'load':
+            return sorted(cores, key=lambda r: -self.utilization(r))
+
+        latency = dict((r, 0) for r in cores)
+        for (chain, age, rt, details_age, details_rt) in self.index.latencies():
+            for t in chain.task_sequence():
+                if t.resource in latency:
+                    latency[t.resource] = max(latency[t.resource], age, rt)
+        return sorted(cores, key=lambda r: -latency[r])
+
+    def refine(self, deadline=None, callback=None):
+        """ Refines the cores (see pending()) until all cores are refined or the deadline (in seconds
+            since the epoch) expires. The analysis of a core is not interrupted.
+
+            :param callback: function called with this object and the core after every refinement
+            :returns: True if all cores are refined
+        """
+        with instrumentation.phase('anytime_refinement'):
+            pending = self.pending()
+            while pending:
+                if deadline is not None and time.time() >= deadline:
+                    logger.info("time budget expired, %d of %d cores refined", len(self.refined), len(self.cores))
+                    return False
+                core = pending.pop(0)
+                self.refine_core(core)
+                logger.info("refined %s", core.name)
+                if callback is not None:
+                    callback(self, core)
+                if self.order == 'chains':
+                    pending = self.pending()
+
+        return True
+
+    def latencies(self):
+        """ Returns the chain latencies (see waters.analysis.chain_latencies()). """
+        return self.index.latencies()
+
+def is_refined(task_result):
+    """ Returns False if the given task result is an (unrefined) bound. """
+    return getattr(task_result, 'refined', True)
+
+def chain_refined(chain, task_results):
+    """ Returns True if the latencies of the given chain only depend on refined results. """
+    return all(is_refined(task_results[t]) for t in chain.task_sequence())
+
+def _rate(event_model):
+    """ Returns the period and jitter of the given event model or None if unknown. """
+    if isinstance(event_model, waters_model.CorrelatedAccessEventModel):
+        event_model = event_model.base_event_model
+    P = getattr(event_model, 'P', None)
+    if P is None or P <= 0:
+        return None
+    return P, getattr(event_model, 'J', 0)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
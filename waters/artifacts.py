@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements a pipeline for the (optional) output artifacts of an analysis,
+such as CSV files, DOT graphs of the task and core interactions or the PDF of the system graph.
+Artifacts are queued once the data they depend on is ready and are generated by a background
+thread, while the caller continues with the analysis. A failing artifact is logged and
+does not affect the other artifacts.
+
+Usage::
+
+    pipeline = artifacts.ArtifactPipeline()
+    pipeline.add('task_interactions.dot', artifacts.write_dot, streams, 'task_interactions.dot')
+    ...
+    failed = pipeline.close()
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import csv
+import logging
+import threading
+from math import ceil
+
+try:
+    import queue
+except ImportError:
+    # python 2
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+class ArtifactPipeline(object):
+    """ Generates artifacts in a background thread (or synchronously with background=False).
+
+        Artifact functions must only read the data they are given, which must not be
+        modified by the caller after the artifact has been added.
+    """
+
+    def __init__(self, background=True):
+        self.background = background
+        self.failed = list()
+        self._queue = None
+        self._thread = None
+
+    def add(self, name, func, *args, **kwargs):
+        """ Queues the artifact with the given name, which is generated by func(*args, **kwargs). """
+        if not self.background:
+            self._generate(name, func, args, kwargs)
+            return
+
+        if self._thread is None:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='artifacts')
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((name, func, args, kwargs))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._generate(*job)
+
+    def _generate(self, name, func, args, kwargs):
+        logger.debug("generating %s", name)
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("generation of %s failed", name)
+            self.failed.append(name)
+
+    def close(self):
+        """ Waits until all queued artifacts are generated and returns the names of the failed artifacts. """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        return self.failed
+
+def write_csv(outfile, header, rows, delimiter='\t'):
+    with open(outfile, 'w+') as csvfile:
+        writer = csv.writer(csvfile, delimiter=delimiter)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def write_dot(streams, outfile, scale=1000.0):
+    """ Writes the given data streams as DOT graph.
+
+    :param streams: dict of data volumes keyed by (writer, reader) pairs (see AmaltheaParser.task_interactions())
+    :param scale: data volume that corresponds to a pen width of 5
+    """
+    with open(outfile, 'w+') as out:
+        print("digraph {", file=out)
+        for (wr_name, rd_name), volume in sorted(streams.items()):
+            if volume > 0:
+                thickness = int(ceil((float(volume) / scale) * 5.0))
+                print ("%s -> %s [label=\"%d\",penwidth=\"%d\"];" % (wr_name, rd_name, volume, thickness), file=out)
+        print("}", file=out)
+
+def graph_system(system, outfile):
+    """ Plots the system graph (requires matplotlib, which is only imported here). """
+    from pycpa import graph
+    graph.graph_system(system, outfile)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements the batch analysis of multiple AMALTHEA models in a shared
+pool of worker processes. Each model is parsed and analysed in a worker that stays alive
+for the whole batch, hence the interpreter startup and module imports are only paid once
+per worker. Models that fail (or exceed their timeout) are reported in the results
+without aborting the batch.
+
+The parent process assigns the models to the workers one by one. If a worker dies (e.g.
+segfault or OOM kill) or does not return within the timeout (e.g. hangs in C code, which
+the alarm in the worker cannot interrupt), the parent terminates it, reports the model as
+'crashed' or 'timeout' and replaces the worker.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import os
+import glob
+import time
+import signal
+import logging
+import traceback
+import multiprocessing
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from . import model as waters_model
+from . import analysis as waters_analysis
+from . import cache as waters_cache
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATTERNS = ['*.amxmi', '*.xml']
+
+# seconds after the per-model timeout at which the parent terminates a worker
+KILL_GRACE = 5.0
+
+# seconds between the checks of the workers
+POLL_INTERVAL = 0.1
+
+class AnalysisTimeout(Exception):
+    pass
+
+def find_models(path):
+    """ Returns the list of model files given by a directory or a manifest file.
+
+        A manifest lists one model file per line (relative to the manifest's directory).
+        Empty lines and lines starting with '#' are ignored.
+    """
+    if os.path.isdir(path):
+        models = set()
+        for pattern in MODEL_PATTERNS:
+            models.update(glob.glob(os.path.join(path, pattern)))
+        return sorted(models)
+
+    base = os.path.dirname(path)
+    models = list()
+    with open(path) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                models.append(os.path.join(base, line))
+    return models
+
+def _raise_timeout(signum, frame):
+    raise AnalysisTimeout()
+
+def _analyze_job(job):
+    """ Worker function: analyses a single model and never raises. """
+    filename, params, timeout, cache_dir, cache_size = job
+
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    # the memoized values of the previous models are of no use for this model
+    waters_model.event_model_memo.invalidate()
+
+    start = time.time()
+    try:
+        cache = None
+        if cache_dir is not None:
+            cache = waters_cache.ResultCache(cache_dir, cache_size)
+        result = waters_analysis.analyze_file(filename, cache=cache, **params)
+        result['status'] = 'ok'
+    except AnalysisTimeout:
+        result = {'status' : 'timeout'}
+    except Exception as e:
+        result = {'status' : 'error', 'error' : repr(e), 'traceback' : traceback.format_exc()}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    result['time'] = time.time() - start
+    return filename, result
+
+def _worker_loop(inbox, outbox, index):
+    """ Worker process: analyses the jobs from its inbox until it receives None. """
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        outbox.put((index,) + _analyze_job(job))
+
+class _Worker(object):
+    """ Worker process with its own inbox and the job it currently analyses. """
+
+    def __init__(self, outbox, index):
+        self.inbox = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(self.inbox, outbox, index))
+        self.process.daemon = True
+        self.process.start()
+        self.job = None
+        self.start = None
+
+    def submit(self, job):
+        self.job = job
+        self.start = time.time()
+        self.inbox.put(job)
+
+    def stop(self):
+        if self.process.is_alive():
+            self.inbox.put(None)
+            self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+
+def _run_jobs(jobs, workers, timeout):
+    """ Analyses the given jobs in the given number of worker processes and yields (filename, result)
+        as they finish. Workers that die or exceed the timeout (plus KILL_GRACE) are replaced.
+    """
+    outbox = multiprocessing.Queue()
+    pool = [_Worker(outbox, i) for i in range(workers)]
+    pending = list(reversed(jobs))
+    running = 0
+
+    def _drain(block):
+        finished = list()
+        try:
+            while True:
+                index, filename, result = outbox.get(block, POLL_INTERVAL) if block else outbox.get_nowait()
+                block = False
+                pool[index].job = None
+                finished.append((filename, result))
+        except queue.Empty:
+            pass
+        return finished
+
+    try:
+        while pending or running:
+            for w in pool:
+                if w.job is None and pending:
+                    w.submit(pending.pop())
+
+            finished = _drain(block=True)
+            for i, w in enumerate(pool):
+                if w.job is None:
+                    continue
+                failure = None
+                if not w.process.is_alive():
+                    # the result may have arrived in the meantime
+                    finished.extend(_drain(block=False))
+                    if w.job is not None:
+                        failure = {'status' : 'crashed', 'exitcode' : w.process.exitcode}
+                elif timeout is not None and time.time() - w.start > timeout + KILL_GRACE:
+                    w.kill()
+                    failure = {'status' : 'timeout'}
+
+                if failure is not None:
+                    failure['time'] = time.time() - w.start
+                    finished.append((w.job[0], failure))
+                    pool[i] = _Worker(outbox, i)
+
+            running = len([w for w in pool if w.job is not None])
+            for item in finished:
+                yield item
+    finally:
+        for w in pool:
+            if w.job is None:
+                w.stop()
+            else:
+                w.kill()
+
+def run_batch(models, workers=None, timeout=None, scale=1.0, let_mode=False, let_task_wcet=50,
+        cache_dir=None, cache_size=256 * 1024 * 1024, read_phases=None):
+    """ Analyses the given model files in a pool of worker processes.
+
+    :param models: list of model files
+    :param workers: number of worker processes (default: number of CPUs)
+    :param timeout: per-model timeout in seconds (None for no timeout)
+    :param cache_dir: directory of a waters.cache.ResultCache; models with stored results are not analysed again
+    :param cache_size: maximum size of the result cache in bytes
+    :param read_phases: granularity of the memory read phases (see AmaltheaParser)
+    :returns: dict of result dicts keyed by model file, each with a 'status' of 'ok', 'error', 'timeout'
+        or 'crashed'
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("invalid number of workers: %d" % workers)
+    if timeout is not None and not hasattr(signal, 'setitimer'):
+        logger.warning("per-model timeouts are not supported on this platform")
+
+    params = {'scale' : scale, 'let_mode' : let_mode, 'let_task_wcet' : let_task_wcet,
+              'read_phases' : read_phases}
+
+    results = dict()
+    if cache_dir is not None:
+        cache = waters_cache.ResultCache(cache_dir, cache_size)
+        for m in models:
+            try:
+                result = cache.get(waters_analysis.cache_key(cache, m, **params))
+            except (IOError, OSError):
+                # unreadable models are reported by the workers
+                continue
+            if result is not None:
+                result['status'] = 'ok'
+                result['cached'] = True
+                results[m] = result
+        logger.info("%d of %d models found in cache", len(results), len(models))
+
+    jobs = [(m, params, timeout, cache_dir, cache_size) for m in models if m not in results]
+    if workers == 1:
+        for job in jobs:
+            filename, result = _analyze_job(job)
+            results[filename] = result
+        return results
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    for filename, result in _run_jobs(jobs, min(workers, len(jobs)), timeout):
+        logger.info("%s: %s (%.2fs)", filename, result['status'], result['time'])
+        results[filename] = result
+
+    return results
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
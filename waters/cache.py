@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements a persistent, content-addressed store for analysis results.
+Results are keyed by the content of the model file, the analysis parameters and
+fingerprints of the waters and pyCPA code, so that a re-run of an identical configuration
+can return the stored results instead of parsing and analysing the model again.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import os
+import glob
+import json
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_fingerprints = dict()
+
+def package_fingerprint(package):
+    """ Returns a fingerprint of the given package, consisting of its version (if available)
+        and a hash of its python sources. The fingerprint changes with every code modification,
+        which invalidates all results computed by a different code base.
+    """
+    name = package.__name__
+    if name not in _fingerprints:
+        h = hashlib.sha1()
+        directory = os.path.dirname(os.path.abspath(package.__file__))
+        for filename in sorted(glob.glob(os.path.join(directory, '*.py'))):
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        _fingerprints[name] = '%s-%s' % (getattr(package, '__version__', 'unknown'), h.hexdigest())
+
+    return _fingerprints[name]
+
+def file_hash(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class ResultCache(object):
+    """ On-disk result store with size-based (least recently used) eviction.
+
+        :param directory: directory of the store (created if necessary)
+        :param max_size: maximum total size of the stored results in bytes
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, filename, **params):
+        """ Returns the key of the results of the given model file and analysis parameters. """
+        import pycpa
+        import waters
+
+        description = {'model'  : file_hash(filename),
+                       'params' : params,
+                       'waters' : package_fingerprint(waters),
+                       'pycpa'  : package_fingerprint(pycpa)}
+        return hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """ Returns the stored results or None. """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                results = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        logger.debug("cache hit %s", key)
+        return results
+
+    def put(self, key, results):
+        """ Stores the given results (atomically) and evicts old entries if necessary. """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(results, f)
+        os.rename(tmp, self._path(key))
+
+        self.evict()
+
+    def evict(self):
+        """ Removes the least recently used entries until the store fits into max_size. """
+        entries = list()
+        total = 0
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                logger.debug("evicted %s", path)
+            except OSError:
+                pass
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements the structural diff between two versions of an AMALTHEA model.
+The diff operates on model signatures (see AmaltheaParser.signature()), which only contain
+plain values and can therefore be stored alongside cached analysis results.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+class ModelDiff(object):
+    """ Structural differences between an old and a new model signature.
+
+        Each attribute is a set of names of the elements that were added, removed or modified.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+        self.runnables = _changed_keys(old['runnables'], new['runnables'])
+        self.labels    = _changed_keys(old['labels'], new['labels'])
+        self.chains    = _changed_keys(old['chains'], new['chains'])
+
+        # cores whose clock or ECU changed and ECUs whose set of cores changed
+        self.cores = _changed_keys(old.get('cores', {}), new.get('cores', {}))
+        self.ecus  = _changed_keys(_ecu_cores(old), _ecu_cores(new))
+
+        self.tasks       = _changed_keys(old['tasks'], new['tasks'])
+        self.allocations = self._changed_task_attribute('core')
+        self.stimuli     = self._changed_task_attribute('period')
+
+    def _changed_task_attribute(self, attribute):
+        old = self.old['tasks']
+        new = self.new['tasks']
+        return set(name for name in self.tasks
+                if name in old and name in new and old[name][attribute] != new[name][attribute])
+
+    def is_empty(self):
+        return not (self.runnables or self.labels or self.chains or self.tasks or self.cores or self.ecus)
+
+    def affected_cores(self):
+        """ Returns the names of the cores (in both versions) whose clock or ECU changed, including
+            all cores of the ECUs whose set of cores changed (as the memory interference depends
+            on the number of cores of an ECU).
+        """
+        cores = set(self.cores)
+        for signature in (self.old, self.new):
+            for name, core in signature.get('cores', {}).items():
+                if core['ecu'] in self.ecus:
+                    cores.add(name)
+        return cores
+
+    def affected_tasks(self):
+        """ Returns the names of the tasks (in both versions) whose execution times,
+            memory accesses, allocation, activation or hardware changed.
+        """
+        tasks = set(self.tasks)
+
+        cores = self.affected_cores()
+        for signature in (self.old, self.new):
+            tasks.update(name for name, task in signature['tasks'].items() if task['core'] in cores)
+
+        for signature in (self.old, self.new):
+            for name in self.runnables:
+                if name in signature['runnables']:
+                    tasks.add(signature['runnables'][name]['task'])
+
+            for name in self.labels:
+                if name in signature['labels'] and signature['labels'][name]['writer'] is not None:
+                    tasks.add(signature['labels'][name]['writer'])
+
+            if self.labels:
+                for runnable in signature['runnables'].values():
+                    if self.labels.intersection(runnable['read']) or self.labels.intersection(runnable['write']):
+                        tasks.add(runnable['task'])
+
+        tasks.discard(None)
+        return tasks
+
+    def affected_resources(self):
+        """ Returns the names of the processing resources (in both versions) that host affected tasks. """
+        resources = set()
+        for name in self.affected_tasks():
+            for signature in (self.old, self.new):
+                if name in signature['tasks']:
+                    resources.add(signature['tasks'][name]['core'])
+        return resources
+
+    def affected_chains(self):
+        """ Returns the names of the chains of the new version that were modified or touch a task
+            on an affected resource (as the response times of all tasks on these resources may change).
+        """
+        resources = self.affected_resources()
+        tasks = set(name for name, task in self.new['tasks'].items() if task['core'] in resources)
+        tasks.update(self.affected_tasks())
+        runnables = self.new['runnables']
+
+        chains = set(name for name in self.chains if name in self.new['chains'])
+        for name, chain in self.new['chains'].items():
+            if any(runnables[r]['task'] in tasks for r in chain):
+                chains.add(name)
+        return chains
+
+    def summary(self):
+        """ Returns the diff as a dict of sorted name lists. """
+        return {'runnables'   : sorted(self.runnables),
+                'labels'      : sorted(self.labels),
+                'tasks'       : sorted(self.tasks),
+                'allocations' : sorted(self.allocations),
+                'stimuli'     : sorted(self.stimuli),
+                'chains'      : sorted(self.chains),
+                'cores'       : sorted(self.cores),
+                'ecus'        : sorted(self.ecus)}
+
+def _changed_keys(old, new):
+    changed = set(old.keys()).symmetric_difference(new.keys())
+    for key in set(old.keys()).intersection(new.keys()):
+        if old[key] != new[key]:
+            changed.add(key)
+    return changed
+
+def _ecu_cores(signature):
+    ecus = dict()
+    for name, core in signature.get('cores', {}).items():
+        ecus.setdefault(core['ecu'], list()).append(name)
+    return dict((ecu, sorted(cores)) for ecu, cores in ecus.items())
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
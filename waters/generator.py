@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script generates synthetic AMALTHEA models, which contain the model sections
+read by the AmaltheaParser (swModel, hwModel, stimuliModel, mappingModel and constraintsModel).
+The models are used for benchmarking the parser and the analysis with respect to the model size.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import random
+import xml.etree.ElementTree as ET
+
+XSI = 'http://www.w3.org/2001/XMLSchema-instance'
+XMI = 'http://www.omg.org/XMI'
+AM  = 'http://app4mc.eclipse.org/amalthea/0.7.2'
+
+# periods (in ms) as found in automotive systems
+PERIODS = [1, 2, 5, 10, 20, 50, 100, 200, 1000]
+
+LABEL_SIZES = [8, 16, 32, 64, 128, 256]
+
+def generate_model(filename, cores=4, tasks=20, runnables_per_task=10, labels=1000,
+        access_density=5, chains=10, chain_length=4, utilization=0.5, frequency=200000000, seed=0, ecus=1):
+    """ Generates a synthetic AMALTHEA model and writes it to the given file.
+
+    :param cores: number of cores (per ECU)
+    :param tasks: number of (periodic) tasks, distributed round-robin over the cores
+    :param runnables_per_task: number of runnables per task
+    :param labels: number of labels
+    :param access_density: number of label accesses per runnable (at least one read per runnable)
+    :param chains: number of cause-effect chains
+    :param chain_length: number of runnables per chain
+    :param utilization: approximate utilization of each core (w.r.t. the upper execution bounds)
+    :param frequency: clock frequency in Hz
+    :param seed: seed of the random number generator
+    :param ecus: number of ECUs, each with its own cores, clock (frequency increases by 10% per ECU)
+        and labels (i.e. the tasks only communicate within their ECU)
+    """
+    rnd = random.Random(seed)
+
+    ET.register_namespace('xsi', XSI)
+    ET.register_namespace('xmi', XMI)
+    ET.register_namespace('am', AM)
+
+    root = ET.Element('{%s}Amalthea' % AM)
+    root.set('{%s}version' % XMI, '2.0')
+    sw_model    = ET.SubElement(root, 'swModel')
+    hw_model    = ET.SubElement(root, 'hwModel')
+    stim_model  = ET.SubElement(root, 'stimuliModel')
+    const_model = ET.SubElement(root, 'constraintsModel')
+    map_model   = ET.SubElement(root, 'mappingModel')
+
+    # hardware: ECUs with one microcontroller each (the cores are numbered consecutively)
+    ET.SubElement(hw_model, 'coreTypes', name='CoreType', bitWidth='32', instructionsPerCycle='1')
+    hw_system = ET.SubElement(hw_model, 'system', name='System')
+    for e in range(ecus):
+        ecu = ET.SubElement(hw_system, 'ecus', name='ECU' if ecus == 1 else 'ECU%d' % e)
+        mc = ET.SubElement(ecu, 'microcontrollers', name='Microcontroller')
+        quartz = ET.SubElement(mc, 'quartzes', name='Quartz')
+        ET.SubElement(quartz, 'frequency', value=str(float(frequency * (1 + 0.1 * e))), unit='Hz')
+        for c in range(e * cores, (e + 1) * cores):
+            ET.SubElement(mc, 'cores', name='Core%d' % c, coreType='CoreType?type=CoreType')
+            _typed(ET.SubElement(map_model, 'coreAllocation', scheduler=_scheduler(c),
+                    core='Core%d?type=Core' % c), 'am:SchedulerAllocation')
+    total_cores = cores * ecus
+    ecu_of_task = lambda t: (t % total_cores) // cores
+
+    # labels
+    label_names = ['Label_%d' % l for l in range(labels)]
+    for name in label_names:
+        label = ET.SubElement(sw_model, 'labels', name=name, constant='false', bVolatile='false')
+        ET.SubElement(label, 'size', value=str(rnd.choice(LABEL_SIZES)), unit='bit')
+
+    # tasks (rate-monotonic priorities: shorter periods get higher priorities)
+    task_periods = sorted(rnd.choice(PERIODS) for t in range(tasks))
+    tasks_per_core = [len(range(c, tasks, total_cores)) for c in range(total_cores)]
+    runnable_names = list()
+    task_runnables = list()
+    for t, period in enumerate(task_periods):
+        task_name = 'Task_%dms_%d' % (period, t)
+        stimulus_name = 'Stimulus_%s' % task_name
+        task = ET.SubElement(sw_model, 'tasks', name=task_name, priority=str(tasks - t),
+                stimuli='%s?type=Periodic' % stimulus_name, preemption='preemptive')
+        entries = ET.SubElement(ET.SubElement(task, 'callGraph'), 'graphEntries')
+        _typed(entries, 'am:CallSequence')
+
+        stimulus = _typed(ET.SubElement(stim_model, 'stimuli', name=stimulus_name), 'am:Periodic')
+        ET.SubElement(stimulus, 'recurrence', value=str(period), unit='ms')
+
+        _typed(ET.SubElement(map_model, 'taskAllocation', task='%s?type=Task' % task_name,
+                scheduler=_scheduler(t % total_cores)), 'am:TaskAllocation')
+
+        # upper execution bound (in instructions) of each runnable of this task
+        budget = utilization / tasks_per_core[t % total_cores] * period * 1e-3 * frequency
+        upper = max(1, int(budget / runnables_per_task))
+
+        names = list()
+        for r in range(runnables_per_task):
+            name = 'Runnable_%dms_%d_%d' % (period, t, r)
+            _typed(ET.SubElement(entries, 'calls', runnable='%s?type=Runnable' % name), 'am:TaskRunnableCall')
+            names.append(name)
+        runnable_names.extend(names)
+        task_runnables.append((names, upper))
+
+    # runnables with label accesses; each label has (at most) one writing task
+    # and is only accessed by the tasks of the writer's ECU
+    ecu_tasks = [[t for t in range(tasks) if ecu_of_task(t) == e] for e in range(ecus)]
+    ecu_labels = [list() for e in range(ecus)]
+    owned_labels = [list() for t in range(tasks)]
+    for l in range(labels):
+        e = l % ecus
+        ecu_labels[e].append(label_names[l])
+        if ecu_tasks[e]:
+            owned_labels[rnd.choice(ecu_tasks[e])].append(label_names[l])
+
+    for t, (names, upper) in enumerate(task_runnables):
+        for name in names:
+            runnable = ET.SubElement(sw_model, 'runnables', name=name, callback='false', service='false')
+            instructions = _typed(ET.SubElement(runnable, 'runnableItems'), 'am:RunnableInstructions')
+            deviation = ET.SubElement(_typed(ET.SubElement(instructions, 'default'), 'am:InstructionsDeviation'),
+                    'deviation')
+            _typed(ET.SubElement(deviation, 'lowerBound', value=str(max(1, int(upper * 0.2)))), 'am:LongObject')
+            _typed(ET.SubElement(deviation, 'upperBound', value=str(upper)), 'am:LongObject')
+
+            for a in range(max(1, access_density)):
+                if a > 0 and owned_labels[t] and rnd.random() < 0.3:
+                    access, label = 'write', rnd.choice(owned_labels[t])
+                else:
+                    access, label = 'read', rnd.choice(ecu_labels[ecu_of_task(t)] or label_names)
+                _typed(ET.SubElement(runnable, 'runnableItems', data='%s?type=Label' % label, access=access),
+                        'am:LabelAccess')
+
+    # cause-effect chains
+    for c in range(chains):
+        sequence = rnd.sample(runnable_names, min(chain_length, len(runnable_names)))
+        chain = ET.SubElement(const_model, 'eventChains', name='EffectChain_%d' % c,
+                stimulus=_runnable_event(sequence[0]), response=_runnable_event(sequence[-1]))
+        for i in range(1, len(sequence)):
+            segment = _typed(ET.SubElement(chain, 'segments'), 'am:EventChainContainer')
+            ET.SubElement(segment, 'eventChain', name='EffectChain_%d_%d' % (c, i),
+                    stimulus=_runnable_event(sequence[i-1]), response=_runnable_event(sequence[i]))
+
+    ET.ElementTree(root).write(filename, encoding='UTF-8', xml_declaration=True)
+    return filename
+
+def _typed(element, xsi_type):
+    element.set('{%s}type' % XSI, xsi_type)
+    return element
+
+def _scheduler(core):
+    return 'Scheduler_Core%d?type=TaskScheduler' % core
+
+def _runnable_event(runnable):
+    return 'RunnableStart_%s?type=RunnableEvent' % runnable
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements the optional instrumentation of the parser, the analysis passes
+and the waters schedulers. When enabled, it records the wall time of every phase and every
+resource as well as the fixed-point iterations, busy-window lengths and q-values of the
+busy-window computations of each task, including computations that did not converge.
+When disabled (the default), the instrumented code only performs a single check of the
+module-level instrumentation object.
+
+Usage::
+
+    instr = instrumentation.enable()
+    instr.add_hook(lambda event, data: ...)
+    ...  # parse and analyse
+    instrumentation.disable()
+    instr.write_json('report.json')
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import csv
+import json
+import time
+import contextlib
+
+# the currently enabled Instrumentation (None if disabled)
+_active = None
+
+def enable(instrumentation=None):
+    """ Enables the given (or a new) instrumentation and returns it. """
+    global _active
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    _active = instrumentation
+    return instrumentation
+
+def disable():
+    global _active
+    _active = None
+
+def active():
+    """ Returns the enabled instrumentation or None. """
+    return _active
+
+@contextlib.contextmanager
+def phase(name):
+    """ Records the wall time of the enclosed code as phase (if instrumentation is enabled). """
+    if _active is None:
+        yield
+    else:
+        instrumentation = _active
+        start = time.time()
+        try:
+            yield
+        finally:
+            instrumentation.record_phase(name, time.time() - start)
+
+class Instrumentation(object):
+    """ Collects the measurements and dispatches them to the registered hooks.
+
+        Hooks are called as hook(event, data) with event being one of 'phase', 'task' or 'busy_window'.
+
+        :param keep_busy_windows: keep a record of every busy-window computation (otherwise only
+            the aggregates per task are kept)
+    """
+
+    def __init__(self, keep_busy_windows=False):
+        self.keep_busy_windows = keep_busy_windows
+
+        self.phases = list()
+        self.resources = dict()
+        self.tasks = dict()
+        self.busy_windows = list()
+        self.hooks = list()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def _dispatch(self, event, data):
+        for hook in self.hooks:
+            hook(event, data)
+
+    def _task_entry(self, task):
+        if task.name not in self.tasks:
+            self.tasks[task.name] = {'resource' : task.resource.name if task.resource is not None else None,
+                                     'time' : 0.0, 'b_plus_calls' : 0, 'iterations' : 0,
+                                     'max_q' : 0, 'max_busy_window' : 0, 'unfinished' : 0}
+        return self.tasks[task.name]
+
+    def record_phase(self, name, duration):
+        self.phases.append({'name' : name, 'time' : duration})
+        self._dispatch('phase', {'name' : name, 'time' : duration})
+
+    def record_task(self, task, duration):
+        """ Records the time of a WCRT computation of the given task. """
+        entry = self._task_entry(task)
+        entry['time'] += duration
+
+        resource = entry['resource']
+        if resource not in self.resources:
+            self.resources[resource] = {'time' : 0.0, 'wcrt_computations' : 0}
+        self.resources[resource]['time'] += duration
+        self.resources[resource]['wcrt_computations'] += 1
+
+        self._dispatch('task', {'task' : task.name, 'resource' : resource, 'time' : duration})
+
+    def record_busy_window(self, task, q, w, iterations, converged=True):
+        """ Records a busy-window computation (b_plus) of the given task.
+
+            :param converged: False if the computation was aborted before reaching the fixed point
+                (w is the last iterate)
+        """
+        entry = self._task_entry(task)
+        entry['b_plus_calls'] += 1
+        if not converged:
+            entry['unfinished'] += 1
+        entry['iterations'] += iterations
+        entry['max_q'] = max(entry['max_q'], q)
+        entry['max_busy_window'] = max(entry['max_busy_window'], w)
+
+        data = {'task' : task.name, 'q' : q, 'w' : w, 'iterations' : iterations, 'converged' : converged}
+        if self.keep_busy_windows:
+            self.busy_windows.append(data)
+        self._dispatch('busy_window', data)
+
+    def report(self):
+        """ Returns the measurements as dict. """
+        report = {'phases' : self.phases, 'resources' : self.resources, 'tasks' : self.tasks}
+        if self.keep_busy_windows:
+            report['busy_windows'] = self.busy_windows
+        return report
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=1, sort_keys=True)
+
+    def write_csv(self, filename, delimiter='\t'):
+        """ Writes the phases, resources and tasks as (sectioned) CSV. """
+        with open(filename, 'w') as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            writer.writerow(['Phase', 'Time'])
+            writer.writerows([p['name'], p['time']] for p in self.phases)
+            writer.writerow([])
+            writer.writerow(['Resource', 'Time', 'WCRT computations'])
+            writer.writerows([name, r['time'], r['wcrt_computations']]
+                    for name, r in sorted(self.resources.items(), key=lambda x: str(x[0])))
+            writer.writerow([])
+            writer.writerow(['Task', 'Resource', 'Time', 'b_plus calls', 'Iterations', 'max q',
+                    'max busy window', 'Unfinished'])
+            writer.writerows([name, t['resource'], t['time'], t['b_plus_calls'], t['iterations'],
+                    t['max_q'], t['max_busy_window'], t['unfinished']]
+                    for name, t in sorted(self.tasks.items()))
+
+    def write(self, filename, delimiter='\t'):
+        """ Writes the report as CSV (for .csv files) or JSON. """
+        if filename.endswith('.csv'):
+            self.write_csv(filename, delimiter)
+        else:
+            self.write_json(filename)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements the release pattern of the LET tasks of a core. The LET tasks are
+released at their offset in every period of their (periodic) parent task, i.e. their releases
+repeat with the hyperperiod of the parent tasks. The pattern stores the sorted release times
+within one hyperperiod and the cumulative execution demand, so that the demand of all LET tasks
+within a window [0, w) that starts with the synchronous release of the tasks is found by a
+single binary search.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import bisect
+
+try:
+    from math import gcd
+except ImportError:
+    # python 2
+    from fractions import gcd
+
+from . import model as waters_model
+
+# maximum number of releases per hyperperiod
+MAX_RELEASES = 100000
+
+class LETReleasePattern(object):
+    """ Releases of the given LET tasks within one hyperperiod.
+
+        :param let_tasks: list of waters.model.LETTask with periodic (base) event models
+    """
+
+    def __init__(self, let_tasks):
+        self.hyperperiod = 1
+        for t in let_tasks:
+            self.hyperperiod = _lcm(self.hyperperiod, _period(t))
+
+        releases = list()
+        for t in let_tasks:
+            P = _period(t)
+            offset = t.in_event_model.offset % P
+            releases.extend((offset + k * P, t.wcet) for k in range(self.hyperperiod // P))
+        releases.sort()
+
+        self.times = [r[0] for r in releases]
+        self.cumulative = [0]
+        for time, wcet in releases:
+            self.cumulative.append(self.cumulative[-1] + wcet)
+
+    def demand(self, w):
+        """ Returns the execution demand of the releases within [0, w). """
+        if w <= 0:
+            return 0
+        cycles, rest = divmod(w, self.hyperperiod)
+        return cycles * self.cumulative[-1] + self.cumulative[bisect.bisect_left(self.times, rest)]
+
+def pattern_key(let_tasks):
+    """ Returns a key that identifies the release pattern of the given LET tasks,
+        or None if the tasks do not have a (strictly) periodic release pattern.
+    """
+    key = list()
+    for t in let_tasks:
+        em = t.in_event_model.base_event_model
+        if isinstance(em, waters_model.SporadicEventModel) or getattr(em, 'J', None) != 0 \
+                or not getattr(em, 'P', 0) > 0 or em.P != int(em.P):
+            return None
+        key.append((t.name, t.wcet, t.in_event_model.offset, em.P))
+    return tuple(sorted(key))
+
+def release_pattern(let_tasks, max_releases=MAX_RELEASES):
+    """ Returns the LETReleasePattern of the given LET tasks or None if the tasks are not
+        periodic or have more than max_releases releases per hyperperiod.
+    """
+    if pattern_key(let_tasks) is None:
+        return None
+
+    hyperperiod = 1
+    for t in let_tasks:
+        hyperperiod = _lcm(hyperperiod, _period(t))
+        if sum(hyperperiod // _period(ti) for ti in let_tasks) > max_releases:
+            return None
+
+    return LETReleasePattern(let_tasks)
+
+def _period(let_task):
+    return int(let_task.in_event_model.base_event_model.P)
+
+def _lcm(a, b):
+    return a * b // gcd(a, b)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script configures the logging of the waters modules and scripts. Log records are
+written to stderr and, optionally, as JSON lines (one JSON object per record) to a file,
+which can be processed by other tools.
+
+Usage::
+
+    log.add_options(options.parser)
+    options.init_pycpa()
+    log.configure(options.get_opt('log_level'), options.get_opt('log_json'))
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import json
+import logging
+
+LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+# attribute that marks the handlers installed by configure()
+_TAG = '_waters_log'
+
+class JSONLinesFormatter(logging.Formatter):
+    """ Formats a log record as a single-line JSON object. """
+
+    def format(self, record):
+        entry = {'time'    : record.created,
+                 'level'   : record.levelname,
+                 'logger'  : record.name,
+                 'message' : record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, sort_keys=True)
+
+def add_options(parser):
+    """ Adds the --log_level and --log_json arguments to the given argument parser. """
+    parser.add_argument('--log_level', type=str, default='WARNING', choices=LEVELS,
+            help="Log level (DEBUG also logs every cause-effect chain).")
+    parser.add_argument('--log_json', type=str, default=None,
+            help="Writes the log records as JSON lines to given file.")
+
+def configure(level='WARNING', json_file=None):
+    """ Configures the root logger to write records of the given level (or above) to stderr
+        and, if json_file is given, as JSON lines to json_file. The handlers installed by a
+        previous call are replaced, hence repeated calls do not duplicate the records.
+    """
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()) if not isinstance(level, int) else level)
+
+    for handler in list(root.handlers):
+        if getattr(handler, _TAG, False):
+            root.removeHandler(handler)
+            handler.close()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter('%(levelname)s:%(name)s: %(message)s'))
+    _install(root, stream)
+
+    if json_file is not None:
+        handler = logging.FileHandler(json_file, mode='w')
+        handler.setFormatter(JSONLinesFormatter())
+        _install(root, handler)
+
+    return root
+
+def _install(root, handler):
+    setattr(handler, _TAG, True)
+    root.addHandler(handler)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements the memory overhead analysis, i.e. the number of words each task
+writes (shared labels), reads from shared labels (private copies) and reads from read-only
+labels (GRAM). The label accesses of all tasks are stored in a columnar table, which is
+built once and aggregated per task, per core and/or per priority band. As only the
+per-task totals depend on the labels, the table can be reused for repeated queries
+(e.g. in an optimization loop that changes the allocation or priorities of the tasks).
+
+For large tables, the aggregation is vectorized if numpy is available. numpy is only
+imported on demand, so that the small models do not pay for the import.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import bisect
+
+# access kinds (column index of the per-task totals)
+WRITE = 0
+READ  = 1
+GRAM  = 2
+
+KINDS = ['write', 'read', 'GRAM']
+
+# minimum number of label accesses for which the aggregation is vectorized
+VECTORIZE_THRESHOLD = 100000
+
+def _numpy():
+    """ Returns the numpy module or None if it is not available. """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class LabelAccessTable(object):
+    """ Table of the label accesses (one row per access) of the given tasks.
+
+        :param tasks: dict of tasks keyed by name (e.g. AmaltheaParser.cpa_tasks)
+    """
+
+    def __init__(self, tasks):
+        self.names = sorted(tasks.keys())
+        self.tasks = [tasks[name] for name in self.names]
+
+        task_column = list()
+        kind_column = list()
+        size_column = list()
+        for i, task in enumerate(self.tasks):
+            for label in task.write_labels:
+                task_column.append(i)
+                kind_column.append(WRITE)
+                size_column.append(label.size)
+            for label in task.read_labels:
+                task_column.append(i)
+                kind_column.append(GRAM if label.readOnly == True else READ)
+                size_column.append(label.size)
+
+        self.task_column = task_column
+        self.kind_column = kind_column
+        self.size_column = size_column
+
+        self._totals = None
+
+    def __len__(self):
+        return len(self.size_column)
+
+    def totals(self):
+        """ Returns the [write, read, GRAM] words of each task (in the order of self.names). """
+        if self._totals is None:
+            n = len(self.tasks)
+            numpy = _numpy() if len(self) >= VECTORIZE_THRESHOLD else None
+            if numpy is not None:
+                cells = (numpy.array(self.task_column, dtype=numpy.intp) * len(KINDS) +
+                         numpy.array(self.kind_column, dtype=numpy.intp))
+                sizes = numpy.array(self.size_column, dtype=numpy.int64)
+                totals = numpy.bincount(cells, weights=sizes, minlength=n * len(KINDS))
+                self._totals = totals.astype(numpy.int64).reshape((n, len(KINDS))).tolist()
+            else:
+                self._totals = [[0] * len(KINDS) for i in range(n)]
+                for i, kind, size in zip(self.task_column, self.kind_column, self.size_column):
+                    self._totals[i][kind] += size
+
+        return self._totals
+
+    def overhead(self):
+        """ Returns the memory overhead of each task as dict keyed by task name
+            (see AmaltheaParser.memory_overhead()).
+        """
+        results = dict()
+        for name, task, row in zip(self.names, self.tasks, self.totals()):
+            results[name] = {'Resource' : str(task.resource), 'Priority' : task.scheduling_parameter,
+                    'write' : row[WRITE], 'read' : row[READ], 'GRAM' : row[GRAM]}
+        return results
+
+    def aggregate(self, by=('core',), priority_bands=None):
+        """ Returns the sum of write, read and GRAM words per group.
+
+        The groups are determined by the current allocation and priorities of the tasks.
+
+        :param by: attributes to group by, any of 'task', 'core' and 'priority'
+        :param priority_bands: sorted lower bounds of the priority bands, a task with priority p
+            belongs to the band with the largest lower bound <= p (required for 'priority')
+        :returns: dict of {'write', 'read', 'GRAM'} dicts keyed by tuples of the group attributes
+            (the band of a priority is given by its lower bound, or None if below all bands)
+        """
+        if 'priority' in by and priority_bands is None:
+            raise ValueError("grouping by priority requires priority bands")
+
+        keys = [tuple(self._group_attribute(task, name, attribute, priority_bands) for attribute in by)
+                for name, task in zip(self.names, self.tasks)]
+
+        groups = dict()
+        for key, row in zip(keys, self.totals()):
+            group = groups.setdefault(key, [0] * len(KINDS))
+            for kind in range(len(KINDS)):
+                group[kind] += row[kind]
+
+        return dict((key, dict(zip(KINDS, group))) for key, group in groups.items())
+
+    def per_core(self):
+        """ Returns the aggregates per core keyed by core name. """
+        return dict((key[0], value) for key, value in self.aggregate(by=('core',)).items())
+
+    def _group_attribute(self, task, name, attribute, priority_bands):
+        if attribute == 'task':
+            return name
+        elif attribute == 'core':
+            return str(task.resource)
+        elif attribute == 'priority':
+            i = bisect.bisect_right(priority_bands, task.scheduling_parameter)
+            return priority_bands[i-1] if i > 0 else None
+        raise ValueError("unknown attribute %s" % attribute)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -18,6 +18,9 @@ import math
 import logging
 import copy
 import warnings
+import threading
+import weakref
+import collections
 
 from pycpa import model
 
@@ -69,6 +72,14 @@ class MemoryResource(model.Resource):
         self.write_access_wcet= write_access_times[0]
         self.write_access_bcet= write_access_times[1]
 
+class ECU(object):
+    """ Group of processing resources (keyed by scheduler name) that share a memory resource. """
+
+    def __init__(self, name, memory):
+        self.name = name
+        self.memory = memory
+        self.cores = dict()
+
 class Label(object):
 
     def __init__(self, name, size=1, writeTask=None):
@@ -99,6 +110,12 @@ class Label(object):
         assert(self.resource is not None)
         return self.size * self.resource.write_access_bcet
 
+class SporadicEventModel(model.PJdEventModel):
+    """ Event model of a sporadic stimulus with minimum inter-arrival time P, i.e. the activations
+        are not strictly periodic (see waters.let).
+    """
+    pass
+
 class CorrelatedAccessEventModel(model.EventModel):
     def __init__(self, base_event_model, offset, *args, **kwargs):
         model.EventModel.__init__(self, base_event_model.__description__ + ':corr', *args, **kwargs)
@@ -120,6 +137,121 @@ class CorrelatedAccessEventModel(model.EventModel):
         else:
             return 0
         
+class EventModelMemo(object):
+    """ Bounded memo of eta_plus() and delta_plus() values with least-recently-used eviction.
+
+        The values are stored per base event model, i.e. all CorrelatedAccessEventModels
+        of a stimulus (memory tasks, LET tasks) share the values of their base event model.
+        Event models must not be modified while their values are memoized (see invalidate()).
+
+        The memo only keeps weak references to the event models: the values of an event model
+        are removed once it is garbage collected. The memo can be used from multiple threads.
+
+        :param max_size: maximum number of memoized values
+    """
+
+    def __init__(self, max_size=65536):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # values keyed by (id of the event model, function, argument)
+        self._values = collections.OrderedDict()
+        # weak references to the event models and the keys of their values keyed by id
+        self._refs = dict()
+        self._keys = dict()
+        # ids of collected event models (appended by the weakref callbacks)
+        self._collected = list()
+        self._lock = threading.Lock()
+
+    def eta_plus(self, event_model, w):
+        return self._lookup(event_model, 'eta_plus', w)
+
+    def delta_plus(self, event_model, n):
+        return self._lookup(event_model, 'delta_plus', n)
+
+    def _lookup(self, event_model, func, arg):
+        while isinstance(event_model, CorrelatedAccessEventModel):
+            event_model = event_model.base_event_model
+
+        key = (id(event_model), func, arg)
+        with self._lock:
+            self._purge()
+            ref = self._refs.get(key[0])
+            if ref is not None and ref() is event_model and key in self._values:
+                # re-inserted as most recently used entry
+                value = self._values.pop(key)
+                self._values[key] = value
+                self.hits += 1
+                return value
+
+            # computed under the lock, so that the check and the insertion are atomic
+            value = getattr(event_model, func)(arg)
+            self.misses += 1
+            if not self._track(event_model):
+                return value
+            if len(self._values) >= self.max_size:
+                old, _ = self._values.popitem(last=False)
+                self._keys[old[0]].discard(old)
+            self._values[key] = value
+            self._keys[key[0]].add(key)
+            return value
+
+    def _track(self, event_model):
+        """ Registers a weak reference to the given event model (lock held); returns False if
+            the event model does not support weak references (its values are not memoized).
+        """
+        ident = id(event_model)
+        ref = self._refs.get(ident)
+        if ref is not None and ref() is event_model:
+            return True
+        if ref is not None:
+            # id of a collected event model whose callback did not run yet
+            self._remove(ident)
+
+        collected = self._collected
+        try:
+            self._refs[ident] = weakref.ref(event_model, lambda r, ident=ident: collected.append(ident))
+        except TypeError:
+            return False
+        self._keys[ident] = set()
+        return True
+
+    def _purge(self):
+        """ Removes the values of collected event models (lock held). """
+        while self._collected:
+            ident = self._collected.pop()
+            ref = self._refs.get(ident)
+            if ref is not None and ref() is None:
+                self._remove(ident)
+
+    def _remove(self, ident):
+        for key in self._keys.pop(ident, ()):
+            del self._values[key]
+        self._refs.pop(ident, None)
+
+    def invalidate(self, event_model=None):
+        """ Removes the values of the given (base) event model or all values. """
+        with self._lock:
+            if event_model is None:
+                self._values.clear()
+                self._refs.clear()
+                self._keys.clear()
+            else:
+                ident = id(event_model)
+                ref = self._refs.get(ident)
+                if ref is not None and ref() is event_model:
+                    self._remove(ident)
+
+    def stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._values)
+        lookups = hits + misses
+        return {'hits' : hits, 'misses' : misses, 'size' : size,
+                'hit_rate' : float(hits) / lookups if lookups > 0 else 0.0}
+
+# memo shared by the schedulers and the path analysis
+event_model_memo = EventModelMemo()
+
 class Runnable(object):
     def __init__(self, name, bcet, wcet):
         self.wcet = wcet
@@ -153,6 +285,8 @@ class RunnableTask(model.Task):
         self.read_labels = list()
         self.write_labels = list()
         self.memory_input_task = None
+        # read phases (memory_input_task is the first phase)
+        self.memory_input_tasks = list()
         self.memory_output_task = None
         self.LETTask = None
         self.LETOverhead = 0
@@ -182,23 +316,30 @@ class RunnableTask(model.Task):
     def bind_LET_Task(self, LETTask):
         self.LETTask = LETTask
 
-    def update_let_overhead(self):
+    def update_let_overhead(self, resolve_task=None):
         producerTasks = list()
         for label in self.read_labels:
             if label.readOnly == False and label.writeTask not in producerTasks:
                 producerTasks.append(label.writeTask)
-                self.memory_input_task.bind_label(label.writeTask.LETTask.letLabel)
+                writeTask = label.writeTask
+                if resolve_task is not None:
+                    # labels are shared with the base system of a ModelVariant
+                    writeTask = resolve_task(writeTask)
+                if writeTask.LETTask is None:
+                    # the producer communicates implicitly
+                    continue
+                self.memory_input_task.bind_label(writeTask.LETTask.letLabel)
                 self.memory_input_task.update_execution_time()
                 self.update_execution_time()
-        print ("%s, %d" % (self.name, len(producerTasks)))
+        logger.debug("%s: %d producer tasks", self.name, len(producerTasks))
 
     def update_execution_time(self, task_results = None):
         #WCET = sum of all runnables + wcrt of memory task + time for all write-labels
         execWCET = sum(runnable.wcet for runnable in self.runnables)
         if task_results != None:
-            readWCET = task_results[self.memory_input_task].wcrt
+            readWCET = sum(task_results[t].wcrt for t in self.memory_input_tasks)
         else:
-            readWCET = self.memory_input_task.wcet
+            readWCET = sum(t.wcet for t in self.memory_input_tasks)
         writeWCET = sum(label.size for label in self.write_labels)
         self.wcet = execWCET + readWCET + writeWCET
         if self.letMode:
@@ -206,7 +347,7 @@ class RunnableTask(model.Task):
             
         #BCET = sum of all runnables + bcet of memory task + 
         execBCET = sum(runnable.bcet for runnable in self.runnables)
-        readBCET = self.memory_input_task.bcet
+        readBCET = sum(t.bcet for t in self.memory_input_tasks)
         writeBCET = sum(label.size for label in self.write_labels)
         self.bcet = execBCET + readBCET + writeBCET
         if self.letMode:
@@ -231,6 +372,7 @@ class RunnableTask(model.Task):
         if self.name == "Task_10ms":
             pass
         self.memory_input_task = task
+        self.memory_input_tasks = [task]
         task.in_event_model = CorrelatedAccessEventModel(self.in_event_model, 0)
         for l in self.read_labels:
             if l.resource is resource:
@@ -239,7 +381,36 @@ class RunnableTask(model.Task):
             task.update_execution_time()
             self.update_execution_time()
             resource.bind_task(task)
-    
+
+    def create_and_bind_input_tasks(self, resource, label_groups):
+        """ Creates a separate read phase (MemoryTask) for every group of read labels instead of
+            a single memory task for all read labels (see create_and_bind_input_task()).
+
+            Each read phase is a critical section of its own, i.e. a task only blocks the other
+            tasks of its core for the duration of its largest read phase.
+
+            :param label_groups: list of lists of read labels (e.g. the read labels of each runnable)
+        """
+        self.memory_input_tasks = list()
+        for labels in label_groups:
+            labels = [l for l in labels if l.resource is resource]
+            if not labels:
+                continue
+            task = MemoryTask('%s:readlabels:%d' % (self.name, len(self.memory_input_tasks)), parent_task=self)
+            task.in_event_model = CorrelatedAccessEventModel(self.in_event_model, 0)
+            for l in labels:
+                task.bind_label(l)
+            task.update_execution_time()
+            resource.bind_task(task)
+            self.memory_input_tasks.append(task)
+
+        if not self.memory_input_tasks:
+            self.create_and_bind_input_task(resource)
+            return
+
+        self.memory_input_task = self.memory_input_tasks[0]
+        self.update_execution_time()
+
 class EffectChain():
     def __init__(self, name):
         # list of runnables in the effect chain
@@ -255,6 +426,11 @@ class EffectChain():
         """
         self.runnables.append(runnable)
 
+    def parent_task(self, runnable):
+        """ Returns the task which executes the given runnable in the analysed system.
+        """
+        return runnable.parent_task
+
     def task_sequence(self):
         """ Generates and returns the sequence of reader/writer tasks in the form of [reader_, writer_0, reader_1, writer_1,...].
             
@@ -272,11 +448,11 @@ class EffectChain():
             if i > 0 and self.runnables[i-1].parent_task == r.parent_task:
                 if r.position() < self.runnables[i-1].position():
                     # backward communication -> we must add this task to the sequence
-                    task = r.parent_task
+                    task = self.parent_task(r)
                 else:
                     task = None
             else:
-                task = r.parent_task
+                task = self.parent_task(r)
 
             if task is not None:
                 # add reading and writing tasks
@@ -285,14 +461,13 @@ class EffectChain():
 
         return sequence
     
+    def describe(self):
+        """ Returns the runnables and the task sequence of the chain as string. """
+        runnables = "".join(" -> " + run.name for run in self.runnables)
+        tasks = "".join(" -> " + t.name for t in self.task_sequence())
+        return "%s\n%s" % (runnables, tasks)
+
     def print_chain(self):
-        queue = ""
-        for run in self.runnables:
-            queue += " -> " + run.name
-        print (queue)
-        queue = ""
-        for t in self.task_sequence():
-            queue += " -> " + t.name
-        print(queue)
+        print(self.describe())
 
 # vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
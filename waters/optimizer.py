@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements an optimizer of the LET parameters, i.e. the WCET and the release slots
+of the LET tasks of every core and the choice between LET and implicit communication for every
+task. It performs a local search that minimizes the maximum latency of the cause-effect chains
+while keeping every core schedulable.
+
+A candidate configuration is evaluated on a LET variant of the parsed system (see
+AmaltheaParser.create_LET_variant()). The results of a core only depend on the parameters of
+the core and on the LET producers of its tasks, hence they are cached by these parameters and
+only cores with new parameters are analysed. Similarly, the latencies of a chain are cached by
+the parameters of the cores it crosses. The variant is only built if a core or chain is not cached.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import logging
+
+from pycpa import analysis
+
+from . import model as waters_model
+from . import analysis as waters_analysis
+from . import path_analysis
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ['data-age', 'reaction-time', 'both']
+
+class LETConfiguration(object):
+    """ LET parameters of a system.
+
+        :param wcets: WCET of the LET tasks keyed by core (scheduler) name
+        :param extra_slots: number of release slots in addition to the number of LET tasks keyed by core name
+        :param let_tasks: names of the tasks that use LET communication
+    """
+
+    def __init__(self, wcets, extra_slots, let_tasks):
+        self.wcets = dict(wcets)
+        self.extra_slots = dict(extra_slots)
+        self.let_tasks = frozenset(let_tasks)
+
+    def key(self):
+        return (tuple(sorted(self.wcets.items())), tuple(sorted(self.extra_slots.items())), self.let_tasks)
+
+    def replace(self, core=None, wcet=None, extra_slots=None, toggle=None):
+        """ Returns a copy with the given parameter of the given core changed
+            or with the communication of the task named toggle switched.
+        """
+        config = LETConfiguration(self.wcets, self.extra_slots, self.let_tasks)
+        if wcet is not None:
+            config.wcets[core] = wcet
+        if extra_slots is not None:
+            config.extra_slots[core] = extra_slots
+        if toggle is not None:
+            config.let_tasks = self.let_tasks.symmetric_difference([toggle])
+        return config
+
+    def to_dict(self):
+        return {'wcets' : self.wcets, 'extra_slots' : self.extra_slots, 'let_tasks' : sorted(self.let_tasks)}
+
+class Evaluation(object):
+    """ Result of a configuration: the latencies of the chains (or None if a core is not schedulable). """
+
+    def __init__(self, config, latencies=None, unschedulable=None):
+        self.config = config
+        self.latencies = latencies
+        self.unschedulable = unschedulable
+
+    def schedulable(self):
+        return self.latencies is not None
+
+    def cost(self, objective):
+        """ Returns (maximum latency, sum of latencies) of the chains w.r.t. the objective. """
+        if not self.schedulable():
+            return (float('inf'), float('inf'))
+        values = [_latency(age, rt, objective) for (age, rt) in self.latencies.values()]
+        return (max(values) if values else 0, sum(values))
+
+class LETOptimizer(object):
+    """ Local search over the LET parameters of the model parsed by the given AmaltheaParser
+        (with implicit communication).
+
+        :param wcet_candidates: candidate WCETs of the LET tasks
+        :param slot_candidates: candidate numbers of extra release slots
+        :param objective: latency to minimize ('data-age', 'reaction-time' or 'both')
+        :param select_tasks: also choose between LET and implicit communication per task
+    """
+
+    def __init__(self, amt_parser, wcet_candidates, slot_candidates=(0,), objective='data-age', select_tasks=True):
+        assert objective in OBJECTIVES
+        self.parser = amt_parser
+        self.wcet_candidates = sorted(wcet_candidates)
+        self.slot_candidates = sorted(slot_candidates)
+        self.objective = objective
+        self.select_tasks = select_tasks
+
+        self.cores = sorted(amt_parser.cores.keys())
+        core_names = dict((r, name) for name, r in amt_parser.cores.items())
+
+        self._core_tasks = dict((name, sorted(t.name for t in amt_parser.cores[name].tasks))
+                for name in self.cores)
+        self._producers = dict()
+        for name, t in amt_parser.cpa_tasks.items():
+            self._producers[name] = frozenset(l.writeTask.name for l in t.read_labels
+                    if l.readOnly == False and l.writeTask is not None)
+        self._chain_cores = dict()
+        for chain in amt_parser.eventChains:
+            self._chain_cores[chain.name] = sorted(set(core_names[r.parent_task.resource]
+                for r in chain.runnables if r.parent_task.resource in core_names))
+
+        self._evaluations = dict()
+        self._core_cache = dict()
+        self._chain_cache = dict()
+        self.stats = {'evaluations' : 0, 'core_analyses' : 0, 'core_hits' : 0,
+                      'chain_analyses' : 0, 'chain_hits' : 0}
+
+    def initial_configuration(self, wcet):
+        """ Returns the configuration with LET communication for all tasks (as with --let_mode). """
+        return LETConfiguration(dict((c, wcet) for c in self.cores), dict((c, 0) for c in self.cores),
+                self.parser.cpa_tasks.keys())
+
+    def core_key(self, config, core):
+        """ Returns the parameters that determine the results of the given core. """
+        tasks = self._core_tasks[core]
+        let_tasks = frozenset(t for t in tasks if t in config.let_tasks)
+        producers = frozenset(p for t in tasks for p in self._producers[t] if p in config.let_tasks)
+        return (config.wcets[core], config.extra_slots[core], let_tasks, producers)
+
+    def evaluate(self, config):
+        """ Returns the Evaluation of the given configuration. """
+        key = config.key()
+        if key in self._evaluations:
+            return self._evaluations[key]
+
+        self.stats['evaluations'] += 1
+        evaluation = self._evaluate(config)
+        self._evaluations[key] = evaluation
+        return evaluation
+
+    def _evaluate(self, config):
+        keys = dict((c, self.core_key(config, c)) for c in self.cores)
+
+        # reject candidates with a known unschedulable core without building the variant
+        for c in self.cores:
+            entry = self._core_cache.get((c, keys[c]))
+            if entry is not None and not entry['schedulable']:
+                self.stats['core_hits'] += 1
+                return Evaluation(config, unschedulable=c)
+
+        # skip building the variant if the results of all cores and chains are known
+        chain_keys = dict((chain.name, (chain.name, tuple(keys[c] for c in self._chain_cores[chain.name])))
+                for chain in self.parser.eventChains)
+        if all((c, keys[c]) in self._core_cache for c in self.cores) and \
+                all(k in self._chain_cache for k in chain_keys.values()):
+            self.stats['core_hits'] += len(self.cores)
+            self.stats['chain_hits'] += len(chain_keys)
+            return Evaluation(config, dict((name, self._chain_cache[k]) for name, k in chain_keys.items()))
+
+        slots = dict((c, len(keys[c][2]) + config.extra_slots[c]) for c in self.cores)
+        variant = self.parser.create_LET_variant(wcets=config.wcets, slots=slots, let_tasks=config.let_tasks)
+
+        task_results = dict()
+        for c in self.cores:
+            core = variant.resource(self.parser.cores[c])
+            entry = self._core_cache.get((c, keys[c]))
+            if entry is None:
+                self.stats['core_analyses'] += 1
+                entry = self._analyze_core(core, task_results)
+                self._core_cache[(c, keys[c])] = entry
+            else:
+                self.stats['core_hits'] += 1
+                _restore_core(core, entry, task_results)
+            if not entry['schedulable']:
+                return Evaluation(config, unschedulable=c)
+
+        latencies = dict()
+        missing = list()
+        for chain in variant.effect_chains(self.parser.eventChains):
+            chain_key = chain_keys[chain.name]
+            if chain_key in self._chain_cache:
+                self.stats['chain_hits'] += 1
+                latencies[chain.name] = self._chain_cache[chain_key]
+            else:
+                missing.append((chain, chain_key))
+
+        index = path_analysis.ChainIndex([chain for chain, chain_key in missing])
+        index.update(task_results)
+        for (chain, chain_key), (c, age, rt, details_age, details_rt) in zip(missing, index.latencies()):
+            self.stats['chain_analyses'] += 1
+            self._chain_cache[chain_key] = (age, rt)
+            latencies[chain.name] = (age, rt)
+
+        return Evaluation(config, latencies)
+
+    def _analyze_core(self, core, task_results):
+        """ Analyses the given core and the read phases of its tasks and returns the cache entry. """
+        tasks = sorted(core.tasks, key=str)
+        runnable_tasks = [t for t in tasks if isinstance(t, waters_model.RunnableTask)]
+        memory_tasks = [m for t in runnable_tasks for m in t.memory_input_tasks if m.resource is not None]
+        try:
+            waters_analysis.analyze_tasks(memory_tasks, task_results)
+            for t in runnable_tasks:
+                task_results[t] = analysis.TaskResult()
+                t.update_execution_time(task_results = task_results)
+            waters_analysis.analyze_tasks(tasks, task_results)
+        except analysis.NotSchedulableException as e:
+            logger.debug("%s not schedulable: %s", core.name, e)
+            return {'schedulable' : False}
+
+        results = dict((t.name, (task_results[t].wcrt, task_results[t].bcrt)) for t in tasks)
+        schedulable = all(_deadline_met(t, task_results[t]) for t in tasks)
+        return {'schedulable' : schedulable, 'results' : results}
+
+    def moves(self, config):
+        """ Returns the neighbours of the given configuration. """
+        neighbours = list()
+        for c in self.cores:
+            neighbours.extend(config.replace(c, wcet=w) for w in self.wcet_candidates if w != config.wcets[c])
+            neighbours.extend(config.replace(c, extra_slots=n) for n in self.slot_candidates
+                    if n != config.extra_slots[c])
+        if self.select_tasks:
+            for c in self.cores:
+                neighbours.extend(config.replace(toggle=t) for t in self._core_tasks[c])
+        return neighbours
+
+    def optimize(self, initial, max_evaluations=1000):
+        """ Improves the given configuration by (first-improvement) local search until no
+            neighbour improves the cost or max_evaluations configurations were evaluated.
+
+            :returns: Evaluation of the best configuration
+        """
+        best = self.evaluate(initial)
+        if not best.schedulable():
+            logger.warning("initial configuration is not schedulable (%s)", best.unschedulable)
+
+        improved = True
+        while improved:
+            improved = False
+            for config in self.moves(best.config):
+                if self.stats['evaluations'] >= max_evaluations:
+                    logger.warning("stopped after %d evaluations", self.stats['evaluations'])
+                    return best
+                evaluation = self.evaluate(config)
+                if evaluation.cost(self.objective) < best.cost(self.objective):
+                    logger.info("cost %s -> %s", best.cost(self.objective), evaluation.cost(self.objective))
+                    best = evaluation
+                    improved = True
+                    break
+
+        return best
+
+def _restore_core(core, entry, task_results):
+    for t in core.tasks:
+        tr = analysis.TaskResult()
+        tr.wcrt, tr.bcrt = entry['results'][t.name]
+        task_results[t] = tr
+
+def _deadline_met(task, tr):
+    """ Checks the implicit deadline of a task (for a LET task: the period of its parent task)
+        and that the LET tasks are released within the period.
+    """
+    if isinstance(task, waters_model.LETTask):
+        return task.in_event_model.offset >= 0 and tr.wcrt <= task.in_event_model.base_event_model.P
+    elif isinstance(task, waters_model.RunnableTask):
+        return tr.wcrt <= task.in_event_model.P
+    return True
+
+def _latency(age, rt, objective):
+    if objective == 'data-age':
+        return age
+    elif objective == 'reaction-time':
+        return rt
+    return max(age, rt)
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
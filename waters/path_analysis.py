@@ -18,13 +18,82 @@ from __future__ import unicode_literals
 from __future__ import division
 
 import logging
-logger = logging.getLogger("pycpa")
+logger = logging.getLogger(__name__)
 
-from pycpa import model
-from pycpa import schedulers
-from pycpa import analysis
 from . import model as waters_model
 
+class ChainIndex(object):
+    """ Reverse index from the tasks to the chains whose task sequence contains them, which
+        caches the latencies of every chain. If only the results of some tasks changed
+        (e.g. after re-analysing a single core), only the chains that contain one of these
+        tasks are recomputed by update().
+
+        :param chains: list of model.EffectChain
+    """
+
+    def __init__(self, chains):
+        self.chains = list(chains)
+
+        # chain positions keyed by task
+        self._positions = dict()
+        for i, chain in enumerate(self.chains):
+            for task in chain.task_sequence():
+                tasks = [task]
+                if isinstance(task, waters_model.LETTask):
+                    # the LET task is released with its parent task
+                    tasks.append(task.parentTask)
+                elif getattr(task, 'LETTask', None) is not None:
+                    # intra-task communication of a LET reader
+                    tasks.append(task.LETTask)
+                for t in tasks:
+                    positions = self._positions.setdefault(t, list())
+                    if not positions or positions[-1] != i:
+                        positions.append(i)
+
+        # cached (data age, reaction time, data age details, reaction time details) of every chain
+        self._latencies = [None] * len(self.chains)
+
+    def chains_of(self, tasks):
+        """ Returns the chains that contain any of the given tasks (in the order of self.chains). """
+        return [self.chains[i] for i in self._affected(tasks)]
+
+    def _affected(self, tasks):
+        positions = set()
+        for t in tasks:
+            positions.update(self._positions.get(t, ()))
+        return sorted(positions)
+
+    def update(self, task_results, changed_tasks=None):
+        """ Recomputes the latencies of the chains that contain any of the changed tasks
+            and of the chains that have not been computed yet.
+
+            :param changed_tasks: tasks whose results changed since the last update (None: all tasks)
+            :returns: list of the recomputed chains
+        """
+        if changed_tasks is None:
+            positions = range(len(self.chains))
+        else:
+            positions = set(self._affected(changed_tasks))
+            positions.update(i for i, l in enumerate(self._latencies) if l is None)
+            positions = sorted(positions)
+
+        for i in positions:
+            chain = self.chains[i]
+            details_age = dict()
+            details_rt = dict()
+            age = cause_effect_chain_data_age(chain, task_results, details_age)
+            rt  = cause_effect_chain_reaction_time(chain, task_results, details_rt)
+            self._latencies[i] = (age, rt, details_age, details_rt)
+
+        logger.debug("recomputed %d of %d chains", len(positions), len(self.chains))
+        return [self.chains[i] for i in positions]
+
+    def latencies(self):
+        """ Returns the cached latencies as list of (chain, data age, reaction time, data age details,
+            reaction time details), see waters.analysis.chain_latencies().
+        """
+        return [(chain,) + l for chain, l in zip(self.chains, self._latencies) if l is not None]
+
 def cause_effect_chain_reaction_time(chain, task_results, details=None):
     """ computes the reaction time of the given cause effect chain
     :param chain: model.EffectChain
@@ -60,34 +129,36 @@ def _cause_effect_chain_latency(chain, task_results, mode, details):
         if i % 2 == 1:
             # add read to write delay
             delay = _read_to_write(sequence[i-1], sequence[i], task_results, details=details)
-            logger.info("read to write delay: %d" % delay)
+            logger.debug("read to write delay: %d", delay)
             l_max += delay
         else:
             # add write to read delay
             delay = _write_to_read(sequence[i-1], sequence[i], task_results, backward=(mode == 'data-age'),
                     details=details)
-            logger.info("write to read delay: %d" % delay)
+            logger.debug("write to read delay: %d", delay)
             l_max += delay
 
     return l_max
 
 def _calculate_distanceFW(writer, reader, task_results, details):
     if task_results[writer].wcrt <= _period(reader):
-        result = reader.in_event_model.delta_plus(2) - task_results[writer].bcrt
+        result = waters_model.event_model_memo.delta_plus(reader.in_event_model, 2) - task_results[writer].bcrt
         details['WR:'+writer.name+':'+reader.name+'-d_plus-BCRT'] = result
         return result
     else:
-        result = reader.in_event_model.delta_plus(2)
+        result = waters_model.event_model_memo.delta_plus(reader.in_event_model, 2)
         details['WR:'+writer.name+':'+reader.name+'-d_plus'] = result
         return result
     
 def _calculate_distanceBW(writer, reader, task_results, details):
     if "ISR" in writer.name:
-        result = writer.in_event_model.delta_plus(2) + task_results[writer].wcrt - task_results[writer].bcrt
+        result = waters_model.event_model_memo.delta_plus(writer.in_event_model, 2) + task_results[writer].wcrt - task_results[writer].bcrt
         details['WR:'+writer.name+':'+reader.name+'-d_plus+J'] = result
         return result
-    elif task_results[writer].wcrt >= task_results[reader].wcrt:
-        result = writer.in_event_model.delta_plus(2) - task_results[writer].bcrt + (_period(reader) % _period(writer))
+    elif task_results[writer].wcrt >= task_results[reader].wcrt or not _refined(writer, reader, task_results):
+        # the WCRTs of unrefined results (see waters.anytime) are upper bounds only, which do not
+        # decide the comparison, hence we take this (larger) delay
+        result = waters_model.event_model_memo.delta_plus(writer.in_event_model, 2) - task_results[writer].bcrt + (_period(reader) % _period(writer))
         details['WR:'+writer.name+':'+reader.name+'-d_plus-BCRT+harmOffset'] = result
         return result
     else:
@@ -96,6 +167,9 @@ def _calculate_distanceBW(writer, reader, task_results, details):
         details['WR:'+writer.name+':'+reader.name+'+harmOffset'] = result
         return result
 
+def _refined(writer, reader, task_results):
+    return getattr(task_results[writer], 'refined', True) and getattr(task_results[reader], 'refined', True)
+
 def _period(task):
     if isinstance(task, waters_model.LETTask):
         return task.in_event_model.base_event_model.P
@@ -108,7 +182,7 @@ def _calculate_forward_distance(writer, reader, task_results, details):
     
     if _period(reader) > _period(writer):
         # undersampling delay
-        result = reader.in_event_model.delta_plus(2)
+        result = waters_model.event_model_memo.delta_plus(reader.in_event_model, 2)
         details['WR:'+writer.name+':'+reader.name+'-d_plus'] = result
         return result
 
@@ -128,7 +202,7 @@ def _calculate_backward_distance(writer, reader, task_results, details):
 
     if _period(reader) < _period(writer):
         # oversampling delay
-        result = writer.in_event_model.delta_plus(2) + task_results[writer].wcrt - task_results[writer].bcrt
+        result = waters_model.event_model_memo.delta_plus(writer.in_event_model, 2) + task_results[writer].wcrt - task_results[writer].bcrt
         details['WR:'+writer.name+':'+reader.name+'-d_plus+J'] = result
         return result
 
@@ -163,7 +237,7 @@ def _write_to_read(writer, reader, task_results, details, backward=False):
             return 0
         else:
             # implicit communication
-            result = reader.in_event_model.delta_plus(2) - task_results[reader].bcrt
+            result = waters_model.event_model_memo.delta_plus(reader.in_event_model, 2) - task_results[reader].bcrt
             details['WR:'+writer.name+':'+reader.name+'-d_plus-BCRT'] = result
             return result
     else:
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements a columnar container of the results of an analysis, i.e. the response
+times and execution time split of all tasks, the load of the processing resources, the memory
+overhead and the chain latencies. The results are collected once after the analysis (without
+modifying the model) and all printers and exporters read from it.
+
+Each table has a fixed schema of typed columns. The tables can be exported as CSV, as
+JSON lines (one object per row) and in a binary columnar format, which stores every column
+as contiguous little-endian array and can be loaded without parsing (see load_binary())::
+
+    magic (8 bytes) | header length (4 bytes, little-endian) | header (JSON) | column data
+
+The header lists the tables with their number of rows and the type, offset (relative to the
+start of the column data) and size of every column. Integer and float columns are stored as
+int64 and float64, bool columns as uint8 and string columns as '\\0'-separated UTF-8. The
+types are enforced when a row is added: non-integral (or infinite) values of integer columns
+and strings containing NUL characters are rejected with a ValueError.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import sys
+import json
+import array
+import struct
+import numbers
+from collections import OrderedDict
+
+from . import model as waters_model
+from . import artifacts
+
+MAGIC = b'WATERS1\n'
+
+try:
+    _string_types = basestring
+except NameError:
+    _string_types = str
+
+_INT64_MIN = -2**63
+_INT64_MAX = 2**63 - 1
+
+TASKS = [('Task', 'str'), ('Resource', 'str'), ('Kind', 'str'), ('Prio', 'int'), ('WCET', 'int'),
+         ('BCET', 'int'), ('PERIOD', 'int'), ('WCRT', 'int'), ('BCRT', 'int'),
+         ('readWCET', 'int'), ('execWCET', 'int'), ('writeWCET', 'int'),
+         ('readBCET', 'int'), ('execBCET', 'int'), ('writeBCET', 'int'), ('Refined', 'bool')]
+RESOURCES = [('Resource', 'str'), ('Load', 'float')]
+MEMORY = [('Task', 'str'), ('Resource', 'str'), ('Priority', 'int'), ('write', 'int'), ('read', 'int'), ('GRAM', 'int')]
+CHAINS = [('Name', 'str'), ('Data Age', 'int'), ('Reaction Time', 'int'), ('Refined', 'bool')]
+
+SCHEMAS = OrderedDict([('tasks', TASKS), ('resources', RESOURCES), ('memory', MEMORY), ('chains', CHAINS)])
+
+# task kinds
+TASK = 'task'
+LET  = 'LET'
+
+# array typecodes of the binary format
+_TYPECODES = {'int' : 'q', 'float' : 'd', 'bool' : 'B'}
+
+class Table(object):
+    """ Columns of equal length with the given schema (list of (name, type) pairs). """
+
+    def __init__(self, schema):
+        self.schema = list(schema)
+        self.columns = OrderedDict((name, list()) for name, kind in self.schema)
+
+    def __len__(self):
+        return len(self.columns[self.schema[0][0]])
+
+    def append(self, row):
+        """ Appends the given row; raises ValueError if a value does not fit the type of its column. """
+        values = [_check(name, kind, value) for (name, kind), value in zip(self.schema, row)]
+        for (name, kind), value in zip(self.schema, values):
+            self.columns[name].append(value)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def rows(self, columns=None, where=None):
+        """ Returns the rows (lists) of the given columns (default: all columns).
+
+            :param where: dict of column values that the returned rows must match
+        """
+        names = [name for name, kind in self.schema]
+        if columns is None:
+            columns = names
+        rows = zip(*[self.columns[name] for name in names])
+        if where is not None:
+            conditions = [(names.index(c), value) for c, value in where.items()]
+            rows = [r for r in rows if all(r[i] == value for i, value in conditions)]
+        positions = [names.index(c) for c in columns]
+        return [[r[i] for i in positions] for r in rows]
+
+class AnalysisResults(object):
+    """ Results of an analysis (see build()) as tables 'tasks', 'resources', 'memory' and 'chains'. """
+
+    def __init__(self):
+        self.tables = OrderedDict((name, Table(schema)) for name, schema in SCHEMAS.items())
+
+    @property
+    def tasks(self):
+        return self.tables['tasks']
+
+    @property
+    def resources(self):
+        return self.tables['resources']
+
+    @property
+    def memory(self):
+        return self.tables['memory']
+
+    @property
+    def chains(self):
+        return self.tables['chains']
+
+    def add_tasks(self, system, task_results, loads=True):
+        """ Adds the results of the tasks of the processing resources of the given system
+            (sorted by resource and task) and the load of these resources.
+            Tasks without results (e.g. not re-analysed, see waters.analysis.analyze_delta()) are skipped.
+        """
+        for r in sorted(system.resources, key=str):
+            if isinstance(r, waters_model.MemoryResource):
+                continue
+            if loads:
+                self.resources.append([r.name, r.load()])
+
+            for t in sorted(r.tasks, key=str):
+                if t not in task_results:
+                    continue
+                tr = task_results[t]
+                refined = getattr(tr, 'refined', True)
+                if isinstance(t.in_event_model, waters_model.CorrelatedAccessEventModel):
+                    self.tasks.append([t.name, r.name, LET, t.scheduling_parameter, t.wcet, t.bcet,
+                        t.in_event_model.base_event_model.P, tr.wcrt, tr.bcrt, 0, 0, 0, 0, 0, 0, refined])
+                else:
+                    self.tasks.append([t.name, r.name, TASK, t.scheduling_parameter, t.wcet, t.bcet,
+                        t.in_event_model.P, tr.wcrt, tr.bcrt, tr.readWCET, tr.execWCET, tr.writeWCET,
+                        tr.readBCET, tr.execBCET, tr.writeBCET, refined])
+
+    def add_memory_overhead(self, memory_overhead):
+        """ Adds the memory overhead as returned by AmaltheaParser.memory_overhead(). """
+        for name, row in sorted(memory_overhead.items()):
+            self.memory.append([name, row['Resource'], row['Priority'], row['write'], row['read'], row['GRAM']])
+
+    def add_latencies(self, latencies, task_results):
+        """ Adds the chain latencies as returned by waters.analysis.chain_latencies(). """
+        for (chain, age, rt, details_age, details_rt) in latencies:
+            refined = all(getattr(task_results[t], 'refined', True) for t in chain.task_sequence())
+            self.chains.append([chain.name, age, rt, refined])
+
+    def to_dict(self):
+        """ Returns the WCRT, memory overhead and latency results (and the results of the LET tasks)
+            as dicts of plain values keyed by name (as returned by waters.analysis.analyze_file()).
+        """
+        wcrt = dict()
+        columns = ['Task', 'Resource', 'Prio', 'WCET', 'BCET', 'PERIOD', 'WCRT', 'BCRT',
+                   'readWCET', 'execWCET', 'writeWCET', 'readBCET', 'execBCET', 'writeBCET']
+        for row in self.tasks.rows(columns, where={'Kind' : TASK}):
+            wcrt[row[0]] = dict(zip(columns[1:], row[1:]))
+
+        memory = dict()
+        columns = [name for name, kind in MEMORY]
+        for row in self.memory.rows(columns):
+            memory[row[0]] = dict(zip(columns[1:], row[1:]))
+
+        latency = dict((name, {'Data Age' : age, 'Reaction Time' : rt})
+                for name, age, rt in self.chains.rows(['Name', 'Data Age', 'Reaction Time']))
+
+        results = {'wcrt' : wcrt, 'memory' : memory, 'latency' : latency}
+
+        # the LET tasks are only included if there are any (required as baseline for the re-analysis)
+        columns = ['Task', 'Resource', 'Prio', 'WCET', 'BCET', 'PERIOD', 'WCRT', 'BCRT']
+        let = dict((row[0], dict(zip(columns[1:], row[1:]))) for row in self.tasks.rows(columns, where={'Kind' : LET}))
+        if let:
+            results['let'] = let
+
+        return results
+
+    def write_csv(self, table, outfile, columns=None, delimiter='\t', where=None):
+        """ Writes the given columns (default: all) of the given table as CSV (bool values as 0/1). """
+        if columns is None:
+            columns = [name for name, kind in self.tables[table].schema]
+        rows = [[int(v) if isinstance(v, bool) else v for v in row]
+                for row in self.tables[table].rows(columns, where=where)]
+        artifacts.write_csv(outfile, columns, rows, delimiter=delimiter)
+
+    def write_jsonl(self, outfile, tables=None):
+        """ Writes the rows of the given tables (default: all) as JSON lines;
+            the attribute 'table' of every object names its table.
+        """
+        if tables is None:
+            tables = list(self.tables.keys())
+        with open(outfile, 'w') as out:
+            for name in tables:
+                names = [c for c, kind in self.tables[name].schema]
+                for row in self.tables[name].rows():
+                    entry = dict(zip(names, row))
+                    entry['table'] = name
+                    out.write(json.dumps(entry, sort_keys=True) + '\n')
+
+    def write_binary(self, outfile):
+        """ Writes all tables in the binary columnar format (see module description). """
+        header = {'tables' : OrderedDict()}
+        blobs = list()
+        offset = 0
+        for name, table in self.tables.items():
+            columns = list()
+            for column, kind in table.schema:
+                data = _encode(kind, table.column(column))
+                columns.append({'name' : column, 'type' : kind, 'offset' : offset, 'size' : len(data)})
+                blobs.append(data)
+                offset += len(data)
+            header['tables'][name] = {'rows' : len(table), 'columns' : columns}
+
+        header = json.dumps(header).encode('utf-8')
+        with open(outfile, 'wb') as out:
+            out.write(MAGIC)
+            out.write(struct.pack('<I', len(header)))
+            out.write(header)
+            for data in blobs:
+                out.write(data)
+
+def build(system, task_results, latencies=None, memory_overhead=None, loads=True):
+    """ Collects the results of the given system (only reads the model and the task results).
+
+    :param latencies: chain latencies as returned by waters.analysis.chain_latencies()
+    :param memory_overhead: memory overhead as returned by AmaltheaParser.memory_overhead()
+    :param loads: include the load of the processing resources
+    """
+    results = AnalysisResults()
+    results.add_tasks(system, task_results, loads)
+    if memory_overhead is not None:
+        results.add_memory_overhead(memory_overhead)
+    if latencies is not None:
+        results.add_latencies(latencies, task_results)
+    return results
+
+def load_binary(infile):
+    """ Loads results written by AnalysisResults.write_binary(). The columns are numpy arrays
+        if numpy is available (and lists otherwise).
+    """
+    with open(infile, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a binary result file" % infile)
+        length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+        data = f.read()
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    results = AnalysisResults()
+    for name, table in header['tables'].items():
+        for column in table['columns']:
+            values = _decode(column['type'], data[column['offset']:column['offset'] + column['size']],
+                    table['rows'], numpy)
+            results.tables[name].columns[column['name']] = values
+    return results
+
+def _check(name, kind, value):
+    """ Returns the given value as the type of its column (integral floats are accepted as int). """
+    if kind == 'str':
+        if not isinstance(value, _string_types) or '\0' in value:
+            raise ValueError("%s: %r is not a string without NUL characters" % (name, value))
+        return value
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'float':
+        return float(value)
+
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or \
+            (not isinstance(value, numbers.Integral) and not float(value).is_integer()):
+        raise ValueError("%s: %r is not an integer" % (name, value))
+    if not _INT64_MIN <= value <= _INT64_MAX:
+        raise ValueError("%s: %r exceeds the int64 range" % (name, value))
+    return int(value)
+
+def _encode(kind, values):
+    """ Returns the bytes of the given column (see _check() for the types of the values). """
+    if kind == 'str':
+        return '\0'.join(values).encode('utf-8')
+
+    values = array.array(_TYPECODES[kind], values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tostring() if not hasattr(values, 'tobytes') else values.tobytes()
+
+def _decode(kind, data, rows, numpy=None):
+    if kind == 'str':
+        return data.decode('utf-8').split('\0') if rows > 0 else []
+
+    if numpy is not None:
+        dtype = {'int' : '<i8', 'float' : '<f8', 'bool' : 'u1'}[kind]
+        values = numpy.frombuffer(data, dtype=dtype)
+        return values.astype(bool) if kind == 'bool' else values
+
+    values = array.array(_TYPECODES[kind])
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [bool(v) for v in values] if kind == 'bool' else values.tolist()
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -21,22 +21,42 @@ from __future__ import division
 
 import itertools
 import math
+import time
 import logging
 
 from pycpa import schedulers
 from pycpa import analysis
+from pycpa import options
 from . import model
+from . import instrumentation
+from . import let
 
 amalthea_high_prio_wins = lambda a, b : a >= b
 
-class FIFOSchedulerFair(analysis.Scheduler):
+class InstrumentedScheduler(analysis.Scheduler):
+    """ Base class of the waters schedulers, which records the time of each WCRT computation
+        if instrumentation is enabled (see waters.instrumentation).
+    """
+
+    def compute_wcrt(self, task, *args, **kwargs):
+        instr = instrumentation.active()
+        if instr is None:
+            return analysis.Scheduler.compute_wcrt(self, task, *args, **kwargs)
+
+        start = time.time()
+        try:
+            return analysis.Scheduler.compute_wcrt(self, task, *args, **kwargs)
+        finally:
+            instr.record_task(task, time.time() - start)
+
+class FIFOSchedulerFair(InstrumentedScheduler):
     """ Fair FIFO scheduler for memory accesses.
         This scheduler bases on the assumption that each access is (at most) interfered
         by one access from each of the interfering cores.
     """
 
     def __init__(self, num_cores):
-        analysis.Scheduler.__init__(self)
+        InstrumentedScheduler.__init__(self)
 
         self.num_cores        = num_cores
 
@@ -45,24 +65,83 @@ class FIFOSchedulerFair(analysis.Scheduler):
 
         w = task.wcet * self.num_cores #for the memory tasks, it wcet is multiplied by number of cores
 
+        instr = instrumentation.active()
+        if instr is not None:
+            instr.record_busy_window(task, q, w, iterations=1)
+
         return w
 
-class SPPSchedulerWithCritSection(analysis.Scheduler):
+    def analyze_tasks(self, tasks, task_results):
+        """ Closed-form analysis of the given tasks, which is equivalent to compute_bcrt() and
+            compute_wcrt() as the busy window does not depend on q or on other tasks:
+            the WCRT is the busy window of the first activation (hence q_wcrt is 1),
+            the BCRT is the BCET.
+        """
+        instr = instrumentation.active()
+        for task in tasks:
+            start = time.time()
+            w = self.b_plus(task, 1)
+
+            # compute_wcrt() would iterate over the activations within the busy window;
+            # only its max_iterations check remains relevant
+            q = 1
+            while not self.stopping_condition(task, q, w):
+                q += 1
+                if q > options.get_opt('max_iterations'):
+                    raise analysis.NotSchedulableException("%s: exceeded max_iterations" % task.name)
+            if w > options.get_opt('max_wcrt'):
+                raise analysis.NotSchedulableException("%s: WCRT exceeds max_wcrt" % task.name)
+
+            tr = task_results.setdefault(task, analysis.TaskResult())
+            tr.wcrt = w
+            tr.bcrt = self.b_min(task, 1)
+            tr.q_wcrt = 1
+            tr.busy_times = [0] + [w] * q
+
+            if instr is not None:
+                instr.record_task(task, time.time() - start)
+
+class SPPSchedulerWithCritSection(InstrumentedScheduler):
 
     def __init__(self, priority_cmp=amalthea_high_prio_wins):
-        analysis.Scheduler.__init__(self)
+        InstrumentedScheduler.__init__(self)
 
         # # priority ordering
         self.priority_cmp = priority_cmp
+
+        # LET release patterns (or None) keyed by waters.let.pattern_key()
+        self._let_patterns = dict()
         
+    def let_release_pattern(self, task):
+        """ Returns the release pattern of the LET tasks that interfere with the given task
+            or None if their interference must be computed individually.
+        """
+        let_tasks = [ti for ti in task.get_resource_interferers() if isinstance(ti, model.LETTask)
+                and self.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter)]
+        if not let_tasks:
+            return None
+
+        key = let.pattern_key(let_tasks)
+        if key is None:
+            return None
+
+        if key not in self._let_patterns:
+            if len(self._let_patterns) >= 1024:
+                self._let_patterns.clear()
+            self._let_patterns[key] = let.release_pattern(let_tasks)
+        return self._let_patterns[key]
+
     def get_largestCriticalSection(self, task, task_results):
         size = 0
         for ti in task.get_resource_interferers():
             if("LET" in ti.name):
                 if(ti.wcet >= size):
                     size = ti.wcet      #This is an LET Task
-            elif(task_results[ti.memory_input_task].wcrt >= size):
-                    size = task_results[ti.memory_input_task].wcrt                
+            else:
+                # every read phase is a critical section of its own
+                for m in ti.memory_input_tasks:
+                    if(task_results[m].wcrt >= size):
+                        size = task_results[m].wcrt
             
         return size
             
@@ -76,41 +155,61 @@ class SPPSchedulerWithCritSection(analysis.Scheduler):
         if task.name == "Task_20ms":
             pass
 
-        while True:
-            # logging.debug("w: %d", w)
-            # logging.debug("e: %d", q * task.wcet)
-            s = self.get_largestCriticalSection(task,kwargs["task_results"])
-            # logging.debug(task.name+" interferers "+ str([i.name for i in task.get_resource_interferers()]))
-            for ti in task.get_resource_interferers():
-                assert(ti.scheduling_parameter != None)
-                assert(ti.resource == task.resource)
+        # releases of the (periodic) LET tasks relative to the synchronous release of all tasks
+        let_pattern = self.let_release_pattern(task)
+
+        instr = instrumentation.active()
+        iterations = 0
+        converged = False
+        try:
+            while True:
+                iterations += 1
+                # logging.debug("w: %d", w)
+                # logging.debug("e: %d", q * task.wcet)
+                s = self.get_largestCriticalSection(task,kwargs["task_results"])
+                if let_pattern is not None:
+                    s += let_pattern.demand(w)
+                # logging.debug(task.name+" interferers "+ str([i.name for i in task.get_resource_interferers()]))
+                for ti in task.get_resource_interferers():
+                    assert(ti.scheduling_parameter != None)
+                    assert(ti.resource == task.resource)
                 
-                if self.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter):  # equal priority also interferes (FCFS)
-                    if isinstance(ti, model.LETTask):
-                        if s + q * task.wcet >= ti.in_event_model.offset:
-                            s += ti.wcet * ti.in_event_model.eta_plus(w)
-                    else:
-                        s += ti.wcet * ti.in_event_model.eta_plus(w)
-                        #print ("Task: %s, s: %d, w: %d" % ()
-                    # logging.debug("e: %s %d x %d", ti.name, ti.wcet, ti.in_event_model.eta_plus(w))
-
-            w_new = q * task.wcet + s
-            # print ("w_new: ", w_new)
-            if w == w_new:
-                assert(w >= q * task.wcet)
-                if details is not None:
-                    details['q*WCET'] = str(q) + '*' + str(task.wcet) + '=' + str(q * task.wcet)
-                    for ti in task.get_resource_interferers():
-                        if self.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter):
-                            if isinstance(ti, model.LETTask):
-                                if w > ti.in_event_model.offset:
-                                    details[str(ti) + ':eta*WCET'] = str(ti.in_event_model.eta_plus(w)) + '*'\
-                                        + str(ti.wcet) + '=' + str(ti.wcet * ti.in_event_model.eta_plus(w))
-                            else:
-                                details[str(ti) + ':eta*WCET'] = str(ti.in_event_model.eta_plus(w)) + '*'\
-                                    + str(ti.wcet) + '=' + str(ti.wcet * ti.in_event_model.eta_plus(w))
-                return w
-
-            w = w_new
+                    if self.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter):  # equal priority also interferes (FCFS)
+                        if isinstance(ti, model.LETTask):
+                            if let_pattern is None and s + q * task.wcet >= ti.in_event_model.offset:
+                                s += ti.wcet * model.event_model_memo.eta_plus(ti.in_event_model, w)
+                        else:
+                            s += ti.wcet * model.event_model_memo.eta_plus(ti.in_event_model, w)
+                            #print ("Task: %s, s: %d, w: %d" % ()
+                        # logging.debug("e: %s %d x %d", ti.name, ti.wcet, ti.in_event_model.eta_plus(w))
+
+                w_new = q * task.wcet + s
+                # print ("w_new: ", w_new)
+                if w == w_new:
+                    assert(w >= q * task.wcet)
+                    converged = True
+                    if details is not None:
+                        details['q*WCET'] = str(q) + '*' + str(task.wcet) + '=' + str(q * task.wcet)
+                        if let_pattern is not None:
+                            details['LET:demand'] = str(let_pattern.demand(w))
+                        for ti in task.get_resource_interferers():
+                            if self.priority_cmp(ti.scheduling_parameter, task.scheduling_parameter):
+                                if isinstance(ti, model.LETTask):
+                                    if let_pattern is None and w > ti.in_event_model.offset:
+                                        details[str(ti) + ':eta*WCET'] = str(model.event_model_memo.eta_plus(ti.in_event_model, w)) + '*'\
+                                            + str(ti.wcet) + '=' + str(ti.wcet * model.event_model_memo.eta_plus(ti.in_event_model, w))
+                                else:
+                                    details[str(ti) + ':eta*WCET'] = str(model.event_model_memo.eta_plus(ti.in_event_model, w)) + '*'\
+                                        + str(ti.wcet) + '=' + str(ti.wcet * model.event_model_memo.eta_plus(ti.in_event_model, w))
+                    return w
+
+                w = w_new
+                if w > options.get_opt('max_wcrt'):
+                    # abort diverging busy windows (compute_wcrt() only checks converged ones)
+                    raise analysis.NotSchedulableException("%s: busy window exceeds max_wcrt" % task.name)
+        finally:
+            # also record unfinished (diverging or aborted) busy windows
+            if instr is not None:
+                instr.record_busy_window(task, q, w, iterations, converged=converged)
             
 # vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
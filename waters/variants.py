@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+| Copyright (C) 2017 Johannes Schlatow, Kai-Björn Gemlau, Mischa Möstl
+| TU Braunschweig, Germany
+| All rights reserved.
+
+:Authors:
+         - Johannes Schlatow
+
+Description
+-----------
+
+This script implements copy-on-write variants of a parsed system.
+
+A variant shares all labels, runnables and event models with its base system. Resources
+and their tasks are shared as well until they are requested for modification, in which case
+only the affected resources (and the resources linked to them by memory or LET tasks) are copied.
+Variants can therefore be created and analysed side-by-side (e.g. in threads or forked processes)
+without re-parsing the model and without a full deepcopy.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import copy
+import logging
+
+from . import model as waters_model
+
+logger = logging.getLogger(__name__)
+
+class ModelVariant(object):
+    """ Copy-on-write view of a system.
+
+        :param system: the base system (e.g. as returned by AmaltheaParser.parse_amalthea())
+        :param parent: the ModelVariant the base system belongs to (if deriving from a variant)
+    """
+
+    def __init__(self, system, parent=None):
+        self.base = system
+        self.parent = parent
+
+        # shallow copy of the system with its own set of resources
+        self.system = copy.copy(system)
+        self.system.resources = set(system.resources)
+
+        # maps shared (base) objects to their copies in this variant
+        self.copies = dict()
+        self._owned = set()
+
+    def derive(self):
+        """ Returns a new variant that uses this variant as its base. """
+        return ModelVariant(self.system, parent=self)
+
+    def task(self, task):
+        """ Returns the object that represents the given task in this variant.
+            The given task may belong to the base system or to any parent variant.
+        """
+        if self.parent is not None:
+            task = self.parent.task(task)
+        return self.copies.get(task, task)
+
+    def resource(self, resource):
+        """ Returns the object that represents the given resource in this variant. """
+        if self.parent is not None:
+            resource = self.parent.resource(resource)
+        return self.copies.get(resource, resource)
+
+    def resource_by_name(self, name):
+        for r in self.system.resources:
+            if r.name == name:
+                return r
+        raise KeyError(name)
+
+    def is_copied(self, obj):
+        """ Returns true if the given resource or task is owned (i.e. writable) by this variant. """
+        return obj in self._owned
+
+    def writable_task(self, task):
+        """ Returns a private copy of the given task (and its resource) that may be modified. """
+        task = self.task(task)
+        self.writable_resource(task.resource)
+        return self.task(task)
+
+    def writable_resource(self, resource):
+        """ Returns a private copy of the given resource that may be modified.
+
+            Copying a resource also copies all of its tasks. As the analysis looks up the memory
+            and LET tasks of a runnable task, copying a memory resource also copies the resources
+            hosting the parent tasks, whereas a processing resource can be copied on its own (a shared
+            memory task then still refers to the base parent task, which is never used by the analysis).
+        """
+        resource = self.resource(resource)
+        if self.is_copied(resource):
+            return resource
+
+        pending = [resource]
+        closure = list()
+        while pending:
+            r = pending.pop()
+            if r in closure or self.is_copied(r):
+                continue
+            closure.append(r)
+            for t in r.tasks:
+                for linked in _referencing_tasks(t):
+                    linked = self.task(linked)
+                    if linked.resource is not None and linked.resource not in closure:
+                        pending.append(linked.resource)
+
+        for r in closure:
+            self._copy_resource(r)
+        self._relink()
+
+        return self.copies[resource]
+
+    def writable_runnable(self, runnable):
+        """ Returns a private copy of the given runnable, bound to a private copy of its task. """
+        if self.is_copied(runnable):
+            return runnable
+        if runnable in self.copies:
+            return self.copies[runnable]
+
+        task = self.writable_task(runnable.parent_task)
+        new_runnable = copy.copy(runnable)
+        new_runnable.read_labels = list(runnable.read_labels)
+        new_runnable.write_labels = list(runnable.write_labels)
+        new_runnable.parent_task = task
+        task.runnables = [new_runnable if r is runnable else r for r in task.runnables]
+        self.copies[runnable] = new_runnable
+        self._owned.add(new_runnable)
+        return new_runnable
+
+    def effect_chains(self, chains):
+        """ Returns the given effect chains bound to the tasks of this variant. """
+        return [VariantEffectChain(c, self) for c in chains]
+
+    def _copy_resource(self, resource):
+        logger.debug("copying resource %s", resource.name)
+        new_resource = copy.copy(resource)
+        new_resource.tasks = set()
+        for t in resource.tasks:
+            new_task = _copy_task(t)
+            self.copies[t] = new_task
+            self._owned.add(new_task)
+            new_resource.bind_task(new_task)
+
+        self.copies[resource] = new_resource
+        self._owned.add(new_resource)
+        self.system.resources.discard(resource)
+        self.system.resources.add(new_resource)
+
+    def _relink(self):
+        for t in self._owned:
+            if isinstance(t, waters_model.RunnableTask):
+                if t.memory_input_task is not None:
+                    t.memory_input_task = self.task(t.memory_input_task)
+                t.memory_input_tasks = [self.task(m) for m in t.memory_input_tasks]
+                if t.LETTask is not None:
+                    t.LETTask = self.task(t.LETTask)
+            elif isinstance(t, waters_model.MemoryTask):
+                t.parent_task = self.task(t.parent_task)
+            elif isinstance(t, waters_model.LETTask):
+                t.parentTask = self.task(t.parentTask)
+
+class VariantEffectChain(waters_model.EffectChain):
+    """ Effect chain that shares the runnables of a base chain but resolves their tasks
+        within a ModelVariant.
+    """
+
+    def __init__(self, chain, variant):
+        waters_model.EffectChain.__init__(self, chain.name)
+        self.runnables = chain.runnables
+        self.variant = variant
+
+    def parent_task(self, runnable):
+        return self.variant.task(runnable.parent_task)
+
+def _referencing_tasks(task):
+    """ Returns the tasks whose references to the given task are used by the analysis. """
+    if isinstance(task, waters_model.RunnableTask):
+        return [t for t in (task.LETTask,) if t is not None]
+    elif isinstance(task, waters_model.MemoryTask):
+        return [task.parent_task]
+    elif isinstance(task, waters_model.LETTask):
+        return [task.parentTask]
+    return []
+
+def _copy_task(task):
+    """ Copies a task and its containers, sharing all contained objects (labels, runnables,
+        event models).
+    """
+    new_task = copy.copy(task)
+    for name, value in vars(task).items():
+        if isinstance(value, (list, set, dict)):
+            setattr(new_task, name, type(value)(value))
+    return new_task
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4